@@ -1,10 +1,40 @@
-from flask import Flask, request
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import html, time
+from flask import Flask, Response, request, jsonify, make_response, render_template, stream_with_context
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+import json, time, threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from database.pool import ConnectionPool
+from database.marques import normalize_marque
+from database.historique import PAS, group_series, history_query
+from database.panier import load_price_matrix, optimize_basket
+from database.pagination import NUMBER, TEXT, decode_cursor, encode_cursor, keyset_condition, order_by_clause
+from database.recherche import search_filter, search_rank
+from database.version import VersionWatcher
+from instrumentation import TimedCursor, TimedDictCursor, instrument_app, metrics, record
+from export import csv_chunks, parquet_available, parquet_chunks
+from suggest import Suggester
+from response_cache import FileResponseCache, MemoryResponseCache, make_key
 
 APP_VERSION = f"PRODUITS_MARQUE_MAGASIN_{int(time.time())}"
 PORT = 5055
+PAGE_SIZE = 200
+STREAM_BUFFER_BYTES = 16 * 1024   # rendu streamé : taille mini d'un paquet envoyé au serveur WSGI
+COMPARE_MAX_EANS = 500   # codes-barres acceptés par une comparaison
+PANIER_MAX_ARTICLES = 500
+PANIER_DEFAULT_K = 2     # nombre max de magasins pour la répartition du panier
+API_FETCH_SIZE = 2000   # lignes ramenées par aller-retour du curseur serveur
+API_MAX_LIMIT = 100_000  # ?limit= de /api/produits (sans limit : tout le résultat)
+EXPORT_BATCH_SIZE = 5000   # export CSV / Parquet : lignes par paquet (= row group Parquet)
+
+# historique des prix : points max par magasin après réduction LTTB, fuseau des périodes
+HISTORY_MAX_POINTS = 300
+HISTORY_TZ = "Europe/Paris"
+
+SUGGEST_TOP_N = 10       # complétions renvoyées par défaut (max SUGGEST_MAX_N)
+SUGGEST_MAX_N = 50
 
 PG_HOST = "localhost"
 PG_PORT = 5432
@@ -12,201 +42,922 @@ PG_DB   = "SAE5.6"
 PG_USER = "postgres"
 PG_PASS = "2005"
 
+# pool partagé par tous les threads du processus
+PG_POOL_MIN = 1
+PG_POOL_MAX = 10
+PG_POOL_TIMEOUT = 5.0
+
+# listes déroulantes (catégories, marques, magasins) : ne changent qu'après un import
+REF_CACHE_TTL = 600           # secondes
+FACET_CACHE_MAX_ENTRIES = 256 # compteurs des listes déroulantes, par jeu de filtres
+DATA_VERSION_CHECK = 5.0      # relecture de data_version au plus toutes les N secondes
+
+# cache de pages complètes (clé = filtres normalisés), vidé à chaque nouvel import
+# "memoire" : par processus ; "fichier" : partagé entre workers via RESPONSE_CACHE_DIR ; None : désactivé
+RESPONSE_CACHE_BACKEND = "memoire"
+RESPONSE_CACHE_MAX_ENTRIES = 512
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_DIR = "/tmp/sae56_pages"
+
+# instrumentation : en-tête Server-Timing, /metrics, log des requêtes SQL plus lentes que le seuil
+SLOW_QUERY_MS = 200
+
 app = Flask(__name__)
+instrument_app(app, slow_query_ms=SLOW_QUERY_MS)
+
+_pool = None
+_pool_lock = threading.Lock()
 
-def esc(x):
-    return html.escape("" if x is None else str(x))
+data_version = VersionWatcher(check_interval=DATA_VERSION_CHECK)
 
+if RESPONSE_CACHE_BACKEND == "fichier":
+    page_cache = FileResponseCache(RESPONSE_CACHE_DIR, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+elif RESPONSE_CACHE_BACKEND == "memoire":
+    page_cache = MemoryResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+else:
+    page_cache = None
+suggester = Suggester(lambda: get_conn(), top_n=SUGGEST_TOP_N)
+_ref_cache = None   # (version, expire_a, (categories, marques, magasins)), remplacé d'un bloc
+_facet_cache = (None, OrderedDict())   # (version, filtres -> facettes), remplacé à chaque import
+_facet_lock = threading.Lock()
+
+def get_pool():
+    # créé au 1er appel (et donc après un éventuel fork du serveur WSGI)
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    PG_POOL_MIN, PG_POOL_MAX, checkout_timeout=PG_POOL_TIMEOUT,
+                    cursor_factory=TimedCursor,   # chaque cur.execute est chronométré
+                    host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS
+                )
+    return _pool
+
+@contextmanager
 def get_conn():
-    return psycopg2.connect(
-        host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS
-    )
+    t0 = time.perf_counter()
+    with get_pool().connection() as conn:
+        record("connect", (time.perf_counter() - t0) * 1000)
+        yield conn
+
+def load_reference_lists(cur):
+    # catégories
+    cur.execute("SELECT id_categorie, nom_categorie FROM categorie ORDER BY nom_categorie;")
+    categories = cur.fetchall()
+
+    # marques (dropdown) : table marque, seulement celles qui ont au moins un produit
+    cur.execute("""
+        SELECT m.id_marque, m.nom_marque
+        FROM marque m
+        WHERE EXISTS (SELECT 1 FROM produit p WHERE p.id_marque = m.id_marque)
+        ORDER BY m.nom_marque;
+    """)
+    marques = cur.fetchall()
+
+    # ✅ magasins (dropdown)
+    cur.execute("""
+        SELECT id_magasin, nom_magasin
+        FROM magasin
+        ORDER BY nom_magasin;
+    """)
+    magasins = cur.fetchall()
+
+    return categories, marques, magasins
+
+def get_reference_lists(cur):
+    # cache TTL, invalidé dès que data_version change (import terminé)
+    global _ref_cache
+    version = data_version.current(cur)
+    now = time.monotonic()
+    entry = _ref_cache
+    if entry is not None and entry[0] == version and now < entry[1]:
+        return entry[2]
+
+    data = load_reference_lists(cur)
+    _ref_cache = (version, now + REF_CACHE_TTL, data)
+    return data
+
+def get_facets(cur, f):
+    # même invalidation que les listes déroulantes : les compteurs ne bougent qu'après un import
+    global _facet_cache
+    version = data_version.current(cur)
+    key = (f["nom"], f["marque"], f["cat_id"], f["magasin_id"])
+    with _facet_lock:
+        if _facet_cache[0] != version:
+            _facet_cache = (version, OrderedDict())
+        entries = _facet_cache[1]
+        facets = entries.get(key)
+        if facets is not None:
+            entries.move_to_end(key)
+            return facets
+
+    facets = load_facets(cur, f)
+    with _facet_lock:
+        if _facet_cache[0] == version:
+            entries = _facet_cache[1]
+            entries[key] = facets
+            while len(entries) > FACET_CACHE_MAX_ENTRIES:
+                entries.popitem(last=False)
+    return facets
+
+def invalidate_reference_cache():
+    global _ref_cache, _facet_cache
+    _ref_cache = None
+    _facet_cache = (None, OrderedDict())
+    data_version.expire()
+
+def current_data_version():
+    # pas de connexion empruntée tant que la version en mémoire est fraîche
+    if not data_version.is_fresh():
+        with get_conn() as conn, conn.cursor() as cur:
+            data_version.current(cur)
+    return data_version.version, data_version.updated_at
+
+def conditional_on_data_version(view):
+    # ETag / Last-Modified = dernier import terminé : une revalidation (If-None-Match,
+    # If-Modified-Since) répond 304 sans exécuter la requête produits ni le rendu
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            version, updated_at = current_data_version()
+        except Exception:
+            return view(*args, **kwargs)
+
+        etag = f"{APP_VERSION}-{version}"
+        if updated_at is not None:
+            updated_at = updated_at.replace(microsecond=0)
+
+        not_modified = False
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since and updated_at is not None:
+            not_modified = updated_at <= request.if_modified_since
+
+        if not_modified:
+            resp = make_response("", 304)
+        else:
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+
+        resp.headers["Cache-Control"] = "no-cache"
+        if resp.is_streamed:
+            # en-têtes partis avant la fin du corps (page, NDJSON/CSV de l'API) : on ne sait pas
+            # encore s'il sera complet (erreur en cours de route, client coupé) -> pas de validateur,
+            # sinon un corps tronqué serait revalidé en 304 ; une page rejouée du cache l'aura
+            return resp
+
+        resp.set_etag(etag, weak=True)
+        if updated_at is not None:
+            resp.last_modified = updated_at
+        return resp
+    return wrapper
+
+def cached_by_filters(view):
+    # page déjà rendue pour ces filtres et cette version des données -> renvoyée telle quelle
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if page_cache is None:
+            return view(*args, **kwargs)
+        try:
+            version, _ = current_data_version()
+        except Exception:
+            return view(*args, **kwargs)
+
+        key = make_key(parse_filters(request.args))
+        body = page_cache.get(key, version)
+        if body is not None:
+            return Response(body, mimetype="text/html")
+
+        resp = make_response(view(*args, **kwargs))
+        if resp.status_code != 200:
+            return resp
+        if resp.is_streamed:
+            # page envoyée au fil du rendu : on garde une copie, stockée une fois complète
+            resp.response = tee_into_cache(resp.response, resp, key, version)
+        else:
+            page_cache.put(key, version, resp.get_data())
+        return resp
+    return wrapper
+
+def tee_into_cache(body, resp, key, version):
+    chunks = []
+    for chunk in body:
+        chunks.append(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        yield chunk
+    # page incomplète (erreur SQL en cours de rendu) : pas de mise en cache
+    if getattr(resp, "page_state", {}).get("ok", True):
+        page_cache.put(key, version, b"".join(chunks))
+
+@app.get("/cache")
+def cache_stats():
+    return jsonify(page_cache.snapshot() if page_cache is not None else {})
+
+@app.get("/pool")
+def pool_stats():
+    if _pool is None:
+        return jsonify({"maxconn": PG_POOL_MAX, "checkouts": 0})
+    return jsonify(_pool.snapshot())
+
+@app.get("/metrics")
+def prometheus_metrics():
+    gauges, counters = {}, {}
+    if _pool is not None:
+        snap = _pool.snapshot()
+        gauges["app_pool_in_use"] = ("Connexions PostgreSQL empruntées.", snap["in_use"])
+        gauges["app_pool_max_in_use"] = ("Pic de connexions empruntées.", snap["max_in_use"])
+        counters["app_pool_waits_total"] = ("Emprunts ayant dû attendre une connexion libre.", snap["waits"])
+        counters["app_pool_timeouts_total"] = ("Emprunts abandonnés (pool saturé).", snap["timeouts"])
+    if page_cache is not None:
+        snap = page_cache.snapshot()
+        counters["app_page_cache_hits_total"] = ("Pages servies depuis le cache.", snap["hits"])
+        counters["app_page_cache_misses_total"] = ("Pages absentes du cache.", snap["misses"])
+    if data_version.version is not None:
+        gauges["app_data_version"] = ("Version des données (incrémentée à chaque import).", data_version.version)
+    return Response(metrics.render(gauges, counters), mimetype="text/plain; version=0.0.4")
+
+# clés de tri : (expression SQL, paramètres, sens, nullable) ; départage sur id_produit
+ORDER_MAP = {
+    "prix_asc":  [("MIN(pc.prix)", [], "ASC", True)],
+    "prix_desc": [("MIN(pc.prix)", [], "DESC", True)],
+    "nom_asc":   [("p.nom_produit", [], "ASC", False)],
+    "nom_desc":  [("p.nom_produit", [], "DESC", False)],
+}
+# types attendus des valeurs du curseur "apres", par tri (pertinence : rang puis prix)
+CURSOR_TYPES = {
+    "prix_asc": [NUMBER], "prix_desc": [NUMBER],
+    "nom_asc": [TEXT], "nom_desc": [TEXT],
+    "pertinence": [NUMBER, NUMBER],
+}
+
+def parse_filters(args):
+    nom = (args.get("nom") or "").strip()
+    f = {
+        "nom": nom,
+        "marque": (args.get("marque") or "").strip(),
+        "cat_id": (args.get("cat_id") or "").strip(),
+        "magasin_id": (args.get("magasin_id") or "").strip(),
+        # avec une recherche par nom, on trie par pertinence par défaut
+        "sort": (args.get("sort") or ("pertinence" if nom else "prix_asc")).strip(),
+        "apres": (args.get("apres") or "").strip(),
+    }
+    for k in ("cat_id", "magasin_id"):
+        if f[k] and not f[k].isdigit():
+            f[k] = ""
+    # marque : id (listes déroulantes) ou nom (anciennes URL ?marque=Barilla), résolu en SQL
+    f["marque"] = normalize_marque(f["marque"]) or ""
+    if f["sort"] not in ORDER_MAP and not (f["sort"] == "pertinence" and nom):
+        f["sort"] = "prix_asc"
+    return f
+
+def marque_condition(marque):
+    # -> (condition SQL, paramètres) ; nom inconnu -> sous-requête NULL -> aucun produit (comme avant)
+    by_name = "(SELECT id_marque FROM marque WHERE nom_marque = %s)"
+    if marque.isdigit() and int(marque) < 2**31:
+        # id des listes déroulantes, ou nom de marque numérique ("1664")
+        return f"p.id_marque IN (%s, {by_name})", [int(marque), marque]
+    return f"p.id_marque = {by_name}", [marque]
+
+def product_filters(cur, f):
+    # filtres produit communs à la liste et à la comparaison -> (fragment " AND ...", paramètres)
+    sql, params = "", []
+    if f["nom"]:
+        nom_sql, nom_params = search_filter(cur, f["nom"])
+        sql += nom_sql
+        params.extend(nom_params)
+
+    if f["marque"]:
+        marque_sql, marque_params = marque_condition(f["marque"])
+        sql += f" AND {marque_sql}"
+        params.extend(marque_params)
+
+    if f["cat_id"]:
+        sql += " AND c.id_categorie = %s"
+        params.append(int(f["cat_id"]))
+    return sql, params
+
+def build_product_query(cur, f, limit=None):
+    # -> (sql, params, clés de tri) ; f["apres"] est vidé si le curseur est invalide
+    if f["sort"] == "pertinence":
+        rank_sql, rank_params = search_rank(cur, f["nom"])
+        sort_keys = [(rank_sql, rank_params, "DESC", False), ("MIN(pc.prix)", [], "ASC", True)]
+    else:
+        sort_keys = ORDER_MAP[f["sort"]]
+
+    # requête produits (une ligne par produit)
+    # prix = dernier prix connu (prix_courant), le plus bas entre magasins
+    # si magasin_id sélectionné => prix courant dans ce magasin
+    select_keys = "".join(f", {k[0]} AS tri_{i}" for i, k in enumerate(sort_keys))
+    sql = f"""
+    SELECT
+      p.id_produit,
+      p.nom_produit,
+      COALESCE(mq.nom_marque, p.marque) AS marque,
+      p.code_barres,
+      c.id_categorie,
+      c.nom_categorie,
+      MIN(pc.prix) AS prix
+      {select_keys}
+    FROM produit p
+    JOIN categorie c ON c.id_categorie = p.id_categorie
+    LEFT JOIN marque mq ON mq.id_marque = p.id_marque
+    LEFT JOIN prix_courant pc ON pc.id_produit = p.id_produit
+    WHERE 1=1
+    """
+    params = [x for k in sort_keys for x in k[1]]
+
+    filt_sql, filt_params = product_filters(cur, f)
+    sql += filt_sql
+    params.extend(filt_params)
+
+    if f["magasin_id"]:
+        sql += " AND pc.id_magasin = %s"
+        params.append(int(f["magasin_id"]))
+
+    sql += """
+    GROUP BY p.id_produit, c.id_categorie, mq.id_marque
+    """
+
+    # page suivante : seulement les lignes après le curseur (HAVING, le prix est un agrégat)
+    cursor = decode_cursor(f["apres"], f["sort"], CURSOR_TYPES[f["sort"]]) if f["apres"] else None
+    if cursor:
+        cond_sql, cond_params = keyset_condition(sort_keys, cursor[0], "p.id_produit", cursor[1])
+        sql += f" HAVING {cond_sql}"
+        params.extend(cond_params)
+    else:
+        f["apres"] = ""
+
+    order_sql, order_params = order_by_clause(sort_keys, "p.id_produit")
+    sql += f"""
+    ORDER BY {order_sql}
+    """
+    params.extend(order_params)
+
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, params, sort_keys
+
+def load_facets(cur, f):
+    # nb de produits par catégorie, marque et magasin pour les filtres courants, en UNE requête
+    # (GROUPING SETS) ; chaque facette ignore son propre filtre -> on peut changer de catégorie
+    # sans repasser par "Toutes catégories"
+    conds = {}
+    if f["cat_id"]:
+        conds["categorie"] = ("c.id_categorie = %s", [int(f["cat_id"])])
+    if f["marque"]:
+        conds["marque"] = marque_condition(f["marque"])
+    if f["magasin_id"]:
+        conds["magasin"] = ("pc.id_magasin = %s", [int(f["magasin_id"])])
+
+    counts, params = [], []
+    for facet in ("categorie", "marque", "magasin"):
+        others = [conds[o] for o in conds if o != facet]
+        if others:
+            counts.append("COUNT(DISTINCT p.id_produit) FILTER (WHERE "
+                          + " AND ".join(c[0] for c in others) + f") AS nb_{facet}")
+            params.extend(x for c in others for x in c[1])
+        else:
+            counts.append(f"COUNT(DISTINCT p.id_produit) AS nb_{facet}")
+
+    nom_sql, nom_params = search_filter(cur, f["nom"]) if f["nom"] else ("", [])
+    params.extend(nom_params)
+
+    cur.execute(f"""
+    SELECT
+      c.id_categorie,
+      p.id_marque,
+      pc.id_magasin,
+      GROUPING(c.id_categorie) = 0 AS par_categorie,
+      GROUPING(p.id_marque) = 0 AS par_marque,
+      {", ".join(counts)}
+    FROM produit p
+    JOIN categorie c ON c.id_categorie = p.id_categorie
+    LEFT JOIN prix_courant pc ON pc.id_produit = p.id_produit
+    WHERE 1=1 {nom_sql}
+    GROUP BY GROUPING SETS ((c.id_categorie), (p.id_marque), (pc.id_magasin))
+    """, params)
+
+    facets = {"categorie": {}, "marque": {}, "magasin": {}}
+    for r in cur.fetchall():
+        if r["par_categorie"]:
+            facets["categorie"][r["id_categorie"]] = r["nb_categorie"]
+        elif r["par_marque"]:
+            if r["id_marque"] is not None:
+                facets["marque"][r["id_marque"]] = r["nb_marque"]
+        elif r["id_magasin"] is not None:
+            facets["magasin"][r["id_magasin"]] = r["nb_magasin"]
+    return facets
+
+def stream_page(template_name, **context):
+    # fragments Jinja regroupés en paquets >= STREAM_BUFFER_BYTES : une écriture WSGI par paquet
+    # au lieu d'une par fragment (plusieurs par <tr>) ; {{ flush() }} dans le template envoie
+    # le paquet en cours tout de suite (juste avant une requête lente)
+    pending = {"flush": False}
+
+    def flush():
+        pending["flush"] = True
+        return ""
+
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+
+    def generate():
+        buf, size = [], 0
+        for fragment in template.generate(context, flush=flush):
+            buf.append(fragment)
+            size += len(fragment)
+            if size >= STREAM_BUFFER_BYTES or pending["flush"]:
+                pending["flush"] = False
+                yield "".join(buf)
+                buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+
+    return stream_with_context(generate())
+
+SORT_LABELS = [
+    ("pertinence", "Pertinence"),
+    ("prix_asc", "Prix ↑"),
+    ("prix_desc", "Prix ↓"),
+    ("nom_asc", "Nom A→Z"),
+    ("nom_desc", "Nom Z→A"),
+]
 
 @app.get("/")
+@conditional_on_data_version
+@cached_by_filters
 def home():
-    nom = (request.args.get("nom") or "").strip()
-    marque = (request.args.get("marque") or "").strip()
-    cat_id = (request.args.get("cat_id") or "").strip()
-    magasin_id = (request.args.get("magasin_id") or "").strip()
-    sort = (request.args.get("sort") or "prix_asc").strip()
-
-    order_map = {
-        "prix_asc":  "prix ASC NULLS LAST",
-        "prix_desc": "prix DESC NULLS LAST",
-        "nom_asc":   "nom_produit ASC",
-        "nom_desc":  "nom_produit DESC",
-    }
-    order_by = order_map.get(sort, "prix ASC NULLS LAST")
+    f = parse_filters(request.args)
 
     try:
-        with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # catégories
-            cur.execute("SELECT id_categorie, nom_categorie FROM categorie ORDER BY nom_categorie;")
-            categories = cur.fetchall()
-
-            # marques (dropdown)
-            cur.execute("""
-                SELECT DISTINCT TRIM(marque) AS marque
-                FROM produit
-                WHERE marque IS NOT NULL AND TRIM(marque) <> ''
-                ORDER BY TRIM(marque);
-            """)
-            marques = [r["marque"] for r in cur.fetchall()]
-
-            # ✅ magasins (dropdown)
-            cur.execute("""
-                SELECT id_magasin, nom_magasin
-                FROM magasin
-                ORDER BY nom_magasin;
-            """)
-            magasins = cur.fetchall()
-
-            # requête produits
-            # prix = MIN(op.prix) (simple) mais si magasin_id sélectionné => MIN dans ce magasin
-            sql = f"""
-            SELECT
-              p.nom_produit,
-              p.marque,
-              c.id_categorie,
-              c.nom_categorie,
-              MIN(op.prix) AS prix
+        with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+            categories, marques, magasins = get_reference_lists(cur)
+            facettes = get_facets(cur, f)
+    except Exception as e:
+        return render_template("erreur.html", erreur=e, version=APP_VERSION), 500
+
+    # rempli pendant le rendu ; page_state=False -> page non mise en cache
+    state = {"ok": True, "erreur": None, "next_token": None}
+
+    def produits():
+        # exécuté par le template au moment d'afficher le tableau :
+        # l'en-tête et le formulaire sont déjà partis vers le navigateur
+        # au plus PAGE_SIZE + 1 lignes : lues d'un coup, la connexion est rendue au pool
+        # avant d'écrire vers le client (un client lent ne garde ni connexion ni transaction)
+        try:
+            with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                sql, params, sort_keys = build_product_query(cur, f, limit=PAGE_SIZE + 1)
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+        except Exception as e:
+            state["ok"] = False
+            state["erreur"] = e
+            return
+        if len(rows) > PAGE_SIZE:
+            last = rows[PAGE_SIZE - 1]
+            state["next_token"] = encode_cursor(
+                f["sort"], [last[f"tri_{k}"] for k in range(len(sort_keys))], last["id_produit"]
+            )
+        yield from rows[:PAGE_SIZE]
+
+    # pagination (curseur opaque "apres")
+    base_args = {k: f[k] for k in ("nom", "marque", "cat_id", "magasin_id", "sort") if f[k]}
+
+    resp = Response(stream_page(
+        "produits.html",
+        f=f, categories=categories, marques=marques, magasins=magasins, facettes=facettes,
+        sort_labels=SORT_LABELS, produits=produits(), state=state, base_args=base_args,
+        version=APP_VERSION, page_size=PAGE_SIZE,
+    ), mimetype="text/html")
+    resp.page_state = state
+    return resp
+
+# =========================
+# API JSON
+# =========================
+
+def json_default(x):
+    if isinstance(x, Decimal):
+        return float(x)
+    if isinstance(x, (datetime, date)):
+        return x.isoformat()
+    raise TypeError(f"non sérialisable : {type(x).__name__}")
+
+def stream_query(sql_builder, name, fmt):
+    # curseur serveur (nommé) : le résultat reste côté PostgreSQL, on lit par paquets
+    # -> mémoire du worker constante, même pour un export complet
+    def generate():
+        with get_conn() as conn:
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                sql, params = sql_builder(cur)
+            with conn.cursor(name=name, cursor_factory=TimedDictCursor) as cur:
+                cur.itersize = API_FETCH_SIZE
+                cur.execute(sql, params)
+                # les colonnes tri_N ne servent qu'à la pagination HTML
+                rows = ({k: v for k, v in r.items() if not k.startswith("tri_")} for r in cur)
+
+                if fmt == "json":
+                    yield "["
+                    first = True
+                    for row in rows:
+                        yield ("" if first else ",") + json.dumps(row, default=json_default, ensure_ascii=False)
+                        first = False
+                    yield "]"
+                else:
+                    for row in rows:
+                        yield json.dumps(row, default=json_default, ensure_ascii=False) + "\n"
+
+    mimetype = "application/json" if fmt == "json" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype)
+
+@app.get("/api/produits")
+@conditional_on_data_version
+def api_produits():
+    # mêmes filtres que la page d'accueil ; format=ndjson (défaut) ou json ; limit optionnel
+    f = parse_filters(request.args)
+    fmt = "json" if request.args.get("format") == "json" else "ndjson"
+    limit = request.args.get("limit", type=int)
+    # vérifié avant le streaming : après l'en-tête 200, une erreur SQL ne donnerait qu'un corps tronqué
+    if "limit" in request.args:
+        if limit is None or limit < 1:
+            return jsonify({"erreur": "limit doit être un entier >= 1"}), 400
+        limit = min(limit, API_MAX_LIMIT)
+
+    def builder(cur):
+        sql, params, sort_keys = build_product_query(cur, f, limit=limit)
+        return sql, params
+
+    return stream_query(builder, "api_produits", fmt)
+
+# =========================
+# EXPORT CSV / PARQUET
+# =========================
+
+def observations_query(cur, f, args):
+    # historique complet des relevés, mêmes filtres produit que l'accueil (+ magasin, dates)
+    sql = """
+    SELECT
+      op.id_observation,
+      op.observed_at,
+      op.id_produit,
+      p.nom_produit,
+      mq.nom_marque AS marque,
+      p.code_barres,
+      c.nom_categorie,
+      op.id_magasin,
+      m.nom_magasin,
+      op.prix,
+      op.source
+    FROM observation_prix op
+    JOIN produit p ON p.id_produit = op.id_produit
+    JOIN categorie c ON c.id_categorie = p.id_categorie
+    JOIN magasin m ON m.id_magasin = op.id_magasin
+    LEFT JOIN marque mq ON mq.id_marque = p.id_marque
+    WHERE 1=1
+    """
+    filt_sql, params = product_filters(cur, f)
+    sql += filt_sql
+
+    if f["magasin_id"]:
+        sql += " AND op.id_magasin = %s"
+        params.append(int(f["magasin_id"]))
+    for arg, op in (("debut", ">="), ("fin", "<")):
+        d = parse_date_arg(args, arg)
+        if d is not None:
+            sql += f" AND op.observed_at {op} %s"
+            params.append(d)
+
+    sql += " ORDER BY op.id_observation"
+    return sql, params
+
+def export_batches(sql_builder, name):
+    # -> (générateur de paquets, en-tête) ; le 1er paquet est lu tout de suite pour connaître
+    # les colonnes (description d'un curseur nommé disponible après le 1er fetch)
+    def batches():
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                sql, params = sql_builder(cur)
+            with conn.cursor(name=name) as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+                # les colonnes tri_N ne servent qu'à la pagination HTML
+                keep = [i for i, d in enumerate(cur.description) if not d.name.startswith("tri_")]
+                yield [cur.description[i].name for i in keep], [cur.description[i].type_code for i in keep]
+                while rows:
+                    yield [tuple(r[i] for i in keep) for r in rows]
+                    rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+
+    gen = batches()
+    return gen, next(gen)
+
+@app.get("/export/<quoi>.<fmt>")
+def export(quoi, fmt):
+    # /export/produits.csv : la liste de l'accueil (mêmes filtres et tri, sans pagination)
+    # /export/observations.csv : tout l'historique des relevés (filtres + debut / fin)
+    # .parquet au lieu de .csv si pyarrow est installé
+    if quoi not in ("produits", "observations") or fmt not in ("csv", "parquet"):
+        return jsonify({"erreur": "export inconnu : /export/produits|observations.csv|parquet"}), 404
+    if fmt == "parquet" and not parquet_available():
+        return jsonify({"erreur": "export Parquet indisponible (pip install pyarrow)"}), 501
+
+    f = parse_filters(request.args)
+    f["apres"] = ""
+    args = request.args
+
+    def builder(cur):
+        if quoi == "produits":
+            return build_product_query(cur, f)[:2]
+        return observations_query(cur, f, args)
+
+    gen, (columns, type_codes) = export_batches(builder, f"export_{quoi}")
+    if fmt == "csv":
+        body, mimetype = csv_chunks(columns, gen), "text/csv; charset=utf-8"
+    else:
+        body, mimetype = parquet_chunks(columns, type_codes, gen), "application/vnd.apache.parquet"
+
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{quoi}_{date.today().isoformat()}.{fmt}"'
+    return resp
+
+@app.get("/api/produits/<ean>")
+@conditional_on_data_version
+def api_produit(ean):
+    with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        cur.execute("""
+            SELECT p.id_produit, p.nom_produit, COALESCE(mq.nom_marque, p.marque) AS marque,
+                   p.code_barres, c.id_categorie, c.nom_categorie
             FROM produit p
             JOIN categorie c ON c.id_categorie = p.id_categorie
-            LEFT JOIN observation_prix op ON op.id_produit = p.id_produit
-            WHERE 1=1
-            """
-            params = []
-
-            if nom:
-                sql += " AND p.nom_produit ILIKE %s"
-                params.append(f"%{nom}%")
-
-            if marque:
-                sql += " AND TRIM(COALESCE(p.marque,'')) = %s"
-                params.append(marque)
-
-            if cat_id:
-                try:
-                    cid = int(cat_id)
-                    sql += " AND c.id_categorie = %s"
-                    params.append(cid)
-                except ValueError:
-                    cat_id = ""
-
-            if magasin_id:
-                try:
-                    mid = int(magasin_id)
-                    sql += " AND op.id_magasin = %s"
-                    params.append(mid)
-                except ValueError:
-                    magasin_id = ""
-
-            sql += f"""
-            GROUP BY p.nom_produit, p.marque, c.id_categorie, c.nom_categorie
-            ORDER BY {order_by}
-            LIMIT 200;
-            """
-
-            cur.execute(sql, params)
-            produits = cur.fetchall()
+            LEFT JOIN marque mq ON mq.id_marque = p.id_marque
+            WHERE p.code_barres = %s;
+        """, (ean,))
+        produit = cur.fetchone()
+        if produit is None:
+            return jsonify({"erreur": f"code-barres inconnu : {ean}"}), 404
 
-    except Exception as e:
-        return f"""
-        <h1>Erreur SQL/Connexion</h1>
-        <pre>{esc(e)}</pre>
-        <p>VERSION: {APP_VERSION}</p>
-        """, 500
-
-    # dropdown catégories
-    cat_opts = ['<option value="">Toutes catégories</option>']
-    for c in categories:
-        sel = "selected" if str(c["id_categorie"]) == str(cat_id) else ""
-        cat_opts.append(f'<option value="{c["id_categorie"]}" {sel}>{esc(c["nom_categorie"])}</option>')
-
-    # dropdown marques
-    marque_opts = ['<option value="">Toutes marques</option>']
-    for m in marques:
-        sel = "selected" if m == marque else ""
-        marque_opts.append(f'<option value="{esc(m)}" {sel}>{esc(m)}</option>')
-
-    # ✅ dropdown magasins
-    magasin_opts = ['<option value="">Tous magasins</option>']
-    for m in magasins:
-        sel = "selected" if str(m["id_magasin"]) == str(magasin_id) else ""
-        magasin_opts.append(
-            f'<option value="{m["id_magasin"]}" {sel}>{esc(m["nom_magasin"])}</option>'
-        )
+        cur.execute("""
+            SELECT m.id_magasin, m.nom_magasin, m.enseigne, pc.prix, pc.observed_at
+            FROM prix_courant pc
+            JOIN magasin m ON m.id_magasin = pc.id_magasin
+            WHERE pc.id_produit = %s
+            ORDER BY pc.prix, m.nom_magasin;
+        """, (produit["id_produit"],))
+        prix = cur.fetchall()
+
+    body = json.dumps(dict(produit, prix=prix), default=json_default, ensure_ascii=False)
+    return Response(body, mimetype="application/json")
+
+def parse_date_arg(args, name):
+    v = (args.get(name) or "").strip()
+    if not v:
+        return None
+    try:
+        return date.fromisoformat(v)
+    except ValueError:
+        return None
 
-    # tri
-    def opt(v, label):
-        sel = "selected" if sort == v else ""
-        return f'<option value="{v}" {sel}>{label}</option>'
-
-    sort_opts = "\n".join([
-        opt("prix_asc", "Prix ↑"),
-        opt("prix_desc", "Prix ↓"),
-        opt("nom_asc", "Nom A→Z"),
-        opt("nom_desc", "Nom Z→A"),
-    ])
-
-    # tableau
-    rows = []
-    for p in produits:
-        prix = p["prix"]
-        prix_txt = f"{prix:.2f} €" if prix is not None else "—"
-        rows.append(
-            "<tr>"
-            f"<td>{esc(p['nom_produit'])}</td>"
-            f"<td>{esc(p['marque'])}</td>"
-            f"<td>{esc(p['nom_categorie'])}</td>"
-            f"<td style='text-align:right'>{esc(prix_txt)}</td>"
-            "</tr>"
+@app.get("/api/produits/<int:id_produit>/historique")
+@conditional_on_data_version
+def api_historique(id_produit):
+    # ?pas=jour|semaine|mois (défaut jour) ; debut / fin (AAAA-MM-JJ, fin exclue) ;
+    # magasin_id ; points (max par magasin, réduction LTTB au-delà)
+    pas = PAS.get((request.args.get("pas") or "jour").strip(), "day")
+    points = request.args.get("points", type=int) or HISTORY_MAX_POINTS
+    points = max(3, min(points, HISTORY_MAX_POINTS))
+
+    with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        cur.execute("SELECT id_produit, nom_produit, code_barres FROM produit WHERE id_produit = %s;", (id_produit,))
+        produit = cur.fetchone()
+        if produit is None:
+            return jsonify({"erreur": f"produit inconnu : {id_produit}"}), 404
+
+        noms = {m["id_magasin"]: m["nom_magasin"] for m in get_reference_lists(cur)[2]}
+        sql, params = history_query(
+            id_produit, pas, HISTORY_TZ,
+            debut=parse_date_arg(request.args, "debut"),
+            fin=parse_date_arg(request.args, "fin"),
+            magasin_id=request.args.get("magasin_id", type=int),
         )
-    if not rows:
-        rows = ["<tr><td colspan='4'>Aucun résultat</td></tr>"]
-
-    return f"""<!doctype html>
-<html lang="fr">
-<head>
-<meta charset="utf-8"/>
-<meta name="viewport" content="width=device-width, initial-scale=1"/>
-<title>Produits</title>
-<style>
-body {{ font-family: system-ui, Arial; margin: 24px; }}
-form {{ display:flex; gap:10px; flex-wrap:wrap; margin: 14px 0 18px; }}
-input, select, button {{ padding: 8px 10px; }}
-table {{ width:100%; border-collapse: collapse; }}
-th, td {{ border-bottom: 1px solid #ddd; padding: 10px; text-align:left; }}
-.muted {{ color:#666; font-size:0.9em; }}
-.badge {{ display:inline-block; padding:4px 8px; border:1px solid #ddd; border-radius:999px; }}
-</style>
-</head>
-<body>
-  <h1>Produits</h1>
-  <div class="muted"><span class="badge">VERSION: {APP_VERSION}</span> — max 200 — prix = MIN(prix)</div>
-
-  <form method="get">
-    <input name="nom" placeholder="Filtre nom produit" value="{esc(nom)}"/>
-    <select name="marque">{''.join(marque_opts)}</select>
-    <select name="magasin_id">{''.join(magasin_opts)}</select>
-    <select name="cat_id">{''.join(cat_opts)}</select>
-    <select name="sort">{sort_opts}</select>
-    <button type="submit">Filtrer</button>
-  </form>
-
-  <table>
-    <thead>
-      <tr>
-        <th>Produit</th><th>Marque</th><th>Catégorie</th><th style="text-align:right">Prix</th>
-      </tr>
-    </thead>
-    <tbody>
-      {''.join(rows)}
-    </tbody>
-  </table>
-</body>
-</html>
-"""
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+
+    # points en tableaux (pas de noms de clés répétés) : quelques Ko même sur des années
+    series = []
+    for id_magasin, (nb_periodes, kept) in group_series(rows, points).items():
+        series.append({
+            "id_magasin": id_magasin,
+            "nom_magasin": noms.get(id_magasin),
+            "nb_periodes": nb_periodes,
+            "points": [[r["periode"].date().isoformat(), r["prix_min"], r["prix_moy"], r["prix_max"], r["nb"]] for r in kept],
+        })
+
+    body = dict(produit, pas=pas, colonnes=["periode", "min", "moy", "max", "nb"], series=series)
+    return Response(json.dumps(body, default=json_default, ensure_ascii=False), mimetype="application/json")
+
+@app.get("/api/suggest")
+def api_suggest():
+    # complétions depuis l'index mémoire ; la base n'est lue qu'à la (re)construction
+    q = request.args.get("q") or ""
+    n = max(1, min(request.args.get("n", type=int) or SUGGEST_TOP_N, SUGGEST_MAX_N))
+    try:
+        version, _ = current_data_version()
+        index = suggester.index(version)
+    except Exception as e:
+        return jsonify({"erreur": str(e)}), 503
+
+    suggestions = [{"texte": t, "type": kind, "nb_magasins": score} for t, kind, score in index.search(q, n)]
+    resp = jsonify({"q": q, "suggestions": suggestions})
+    resp.headers["Cache-Control"] = "max-age=60"
+    return resp
+
+# =========================
+# COMPARAISON ENTRE MAGASINS (clé = code-barres)
+# =========================
+
+def parse_eans(args):
+    # ?ean=...&ean=... ou ?eans=a,b c ; seuls les chiffres comptent
+    raw = args.getlist("ean") + (args.get("eans") or "").replace(",", " ").split()
+    eans = []
+    for v in raw:
+        v = "".join(ch for ch in v if ch.isdigit())
+        if v and v not in eans:
+            eans.append(v)
+    return eans[:COMPARE_MAX_EANS]
+
+def parse_id_list(value):
+    return [int(v) for v in (value or "").replace(",", " ").split() if v.isdigit()]
+
+def build_comparison_query(cur, f, eans, magasin_ids, limit):
+    # une seule passe d'agrégation sur prix_courant : une ligne par code-barres,
+    # les prix de tous les magasins dans deux tableaux alignés, triés du moins cher au plus cher
+    sql = """
+    SELECT
+      p.code_barres,
+      p.id_produit,
+      p.nom_produit,
+      COALESCE(mq.nom_marque, p.marque) AS marque,
+      c.nom_categorie,
+      MIN(pc.prix) AS prix_min,
+      MAX(pc.prix) AS prix_max,
+      array_agg(pc.id_magasin ORDER BY pc.prix, pc.id_magasin) AS id_magasins,
+      array_agg(pc.prix ORDER BY pc.prix, pc.id_magasin) AS prix
+    FROM produit p
+    JOIN categorie c ON c.id_categorie = p.id_categorie
+    LEFT JOIN marque mq ON mq.id_marque = p.id_marque
+    JOIN prix_courant pc ON pc.id_produit = p.id_produit
+    WHERE p.code_barres IS NOT NULL
+    """
+    params = []
+
+    if eans:
+        sql += " AND p.code_barres = ANY(%s)"
+        params.append(eans)
+
+    filt_sql, filt_params = product_filters(cur, f)
+    sql += filt_sql
+    params.extend(filt_params)
+
+    if magasin_ids:
+        sql += " AND pc.id_magasin = ANY(%s)"
+        params.append(magasin_ids)
+
+    sql += """
+    GROUP BY p.id_produit, c.id_categorie, mq.id_marque
+    ORDER BY p.nom_produit, p.code_barres
+    LIMIT %s
+    """
+    params.append(limit)
+    return sql, params
+
+def comparison_rows(rows):
+    # prix par magasin + magasin(s) le(s) moins cher(s) (ex aequo compris)
+    out = []
+    for r in rows:
+        prix = dict(zip(r["id_magasins"], r["prix"]))
+        out.append({
+            "code_barres": r["code_barres"],
+            "id_produit": r["id_produit"],
+            "nom_produit": r["nom_produit"],
+            "marque": r["marque"],
+            "nom_categorie": r["nom_categorie"],
+            "prix_min": r["prix_min"],
+            "prix_max": r["prix_max"],
+            "moins_chers": [m for m, v in zip(r["id_magasins"], r["prix"]) if v == r["prix_min"]],
+            "prix": prix,
+        })
+    return out
+
+def load_comparison(args):
+    # -> (filtres, codes-barres, produits, magasins en colonnes, listes de référence)
+    f = parse_filters(args)
+    eans = parse_eans(args)
+    magasin_ids = parse_id_list(args.get("magasins"))
+    limit = max(1, min(args.get("limit", type=int) or PAGE_SIZE, COMPARE_MAX_EANS))
+
+    with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        refs = get_reference_lists(cur)
+        sql, params = build_comparison_query(cur, f, eans, magasin_ids, limit)
+        cur.execute(sql, params)
+        produits = comparison_rows(cur.fetchall())
+
+    # colonnes : magasins demandés, sinon ceux qui ont au moins un prix dans le résultat
+    presents = set(magasin_ids) or {m for p in produits for m in p["prix"]}
+    colonnes = [m for m in refs[2] if m["id_magasin"] in presents]
+    return f, eans, produits, colonnes, refs
+
+@app.get("/comparer")
+@conditional_on_data_version
+def comparer():
+    try:
+        f, eans, produits, colonnes, (categories, marques, magasins) = load_comparison(request.args)
+    except Exception as e:
+        return render_template("erreur.html", erreur=e, version=APP_VERSION), 500
+
+    return render_template(
+        "comparer.html",
+        f=f, eans=eans, produits=produits, colonnes=colonnes,
+        categories=categories, marques=marques,
+        magasins_sel=request.args.get("magasins", ""),
+        version=APP_VERSION,
+    )
+
+@app.get("/api/comparer")
+@conditional_on_data_version
+def api_comparer():
+    f, eans, produits, colonnes, _ = load_comparison(request.args)
+    body = {
+        "magasins": [{"id_magasin": m["id_magasin"], "nom_magasin": m["nom_magasin"]} for m in colonnes],
+        # clés JSON = id_magasin en texte
+        "produits": [dict(p, prix={str(k): v for k, v in p["prix"].items()}) for p in produits],
+    }
+    return Response(json.dumps(body, default=json_default, ensure_ascii=False), mimetype="application/json")
+
+# =========================
+# PANIER : MAGASIN(S) LE(S) MOINS CHER(S)
+# =========================
+
+def parse_basket(payload):
+    # -> (articles, erreur) ; article = {"ean": str} ou {"id_produit": int}, + "quantite"
+    articles = payload.get("articles") if isinstance(payload, dict) else None
+    if not isinstance(articles, list) or not articles:
+        return None, "corps attendu : {\"articles\": [{\"ean\": \"...\", \"quantite\": 1}, ...]}"
+    if len(articles) > PANIER_MAX_ARTICLES:
+        return None, f"panier limité à {PANIER_MAX_ARTICLES} articles"
+
+    out = []
+    for a in articles:
+        if not isinstance(a, dict):
+            return None, f"article invalide : {a!r}"
+        try:
+            quantite = max(1, int(a.get("quantite") or 1))
+        except (TypeError, ValueError):
+            return None, f"quantité invalide : {a!r}"
+        if a.get("id_produit") is not None and str(a["id_produit"]).isdigit():
+            out.append({"id_produit": int(a["id_produit"]), "quantite": quantite})
+        elif a.get("ean") and str(a["ean"]).strip().isdigit():
+            out.append({"ean": str(a["ean"]).strip(), "quantite": quantite})
+        else:
+            return None, f"article sans ean ni id_produit : {a!r}"
+    return out, None
+
+@app.post("/api/panier")
+def api_panier():
+    # {"articles": [{"ean": "...", "quantite": 2}, {"id_produit": 12}], "k": 2,
+    #  "penalite": 5.0 (prix unitaire d'un article manquant, optionnel), "magasins": [ids] (optionnel)}
+    payload = request.get_json(silent=True)
+    articles, erreur = parse_basket(payload)
+    if erreur:
+        return jsonify({"erreur": erreur}), 400
+    try:
+        k = int(payload.get("k") or PANIER_DEFAULT_K)
+        penalite = payload.get("penalite")
+        penalite = float(penalite) if penalite is not None else None
+        magasins = payload.get("magasins") or []
+        if not isinstance(magasins, list):   # "12" serait lu caractère par caractère (magasins 1 et 2)
+            raise TypeError("magasins")
+        magasin_ids = [int(m) for m in magasins]
+    except (TypeError, ValueError):
+        return jsonify({"erreur": "k, penalite ou magasins invalide"}), 400
+
+    with get_conn() as conn, conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        noms = {m["id_magasin"]: m["nom_magasin"] for m in get_reference_lists(cur)[2]}
+        infos, stores, prices = load_price_matrix(cur, articles, magasin_ids)
+
+    result = optimize_basket(articles, infos, stores, prices, k=k, penalty=penalite)
+    for part in (result["meilleur_magasin"], result["repartition"]):
+        if part:
+            part["magasins"] = [{"id_magasin": m, "nom_magasin": noms.get(m)} for m in part["magasins"]]
+    for c in result["classement"]:
+        c["nom_magasin"] = noms.get(c["id_magasin"])
+    return Response(json.dumps(result, default=json_default, ensure_ascii=False), mimetype="application/json")
 
 if __name__ == "__main__":
+    # index d'autocomplétion construit au démarrage plutôt qu'à la première frappe
+    try:
+        suggester.index(current_data_version()[0])
+    except Exception as e:
+        print(f"Autocomplétion : index non construit au démarrage ({e})")
     app.run(debug=True, port=PORT)
@@ -0,0 +1,217 @@
+# dimensions.py
+# Cache mémoire des clés de dimensions (categorie, magasin, marque, produit) pour les imports.
+# ✅ chargé une seule fois au début de l'import
+# ✅ les absents sont créés en lot (INSERT multi-lignes ... RETURNING)
+# -> la plupart des lignes du CSV se résolvent sans aucun appel à la base
+# ✅ INSERT ... ON CONFLICT : un autre import parallèle peut créer la même clé sans doublon
+# ✅ lignes insérées triées par clé de conflit : deux imports parallèles verrouillent dans le même ordre (pas de deadlock)
+
+from psycopg2.extras import execute_values
+
+try:
+    from database.marques import marque_dimension
+except ImportError:  # lancé directement : python database/xxx.py
+    from marques import marque_dimension
+
+BATCH_SIZE = 1000
+
+
+class DimensionCache:
+    def __init__(self):
+        self.categories = {}     # nom_categorie -> id_categorie
+        self.magasins = {}       # url_magasin -> id_magasin
+        self.marques = {}        # nom_marque (normalisé) -> id_marque
+        self.sans_marque = set()  # id_produit encore sans id_marque
+        self.produits_ean = {}   # code_barres -> id_produit
+        self.produits_nom = {}   # (nom_produit, marque, id_categorie) -> id_produit (sans code_barres)
+
+    @classmethod
+    def load(cls, cur):
+        cache = cls()
+
+        cur.execute("SELECT id_categorie, nom_categorie FROM categorie ORDER BY id_categorie;")
+        for id_cat, nom in cur.fetchall():
+            cache.categories.setdefault(nom, id_cat)
+
+        cur.execute("SELECT id_magasin, url_magasin FROM magasin ORDER BY id_magasin;")
+        for id_mag, url in cur.fetchall():
+            cache.magasins.setdefault(url, id_mag)
+
+        cur.execute("SELECT id_marque, nom_marque FROM marque;")
+        cache.marques = {nom: id_marque for id_marque, nom in cur.fetchall()}
+
+        cur.execute("""
+            SELECT id_produit, nom_produit, marque, code_barres, id_categorie, id_marque
+            FROM produit
+            ORDER BY id_produit;
+        """)
+        for id_prod, nom, marque, code_barre, id_cat, id_marque in cur.fetchall():
+            cache.remember_produit(id_prod, nom, marque, code_barre, id_cat)
+            if id_marque is None:
+                cache.sans_marque.add(id_prod)
+
+        return cache
+
+    # ---------- lookups (aucun appel SQL) ----------
+
+    def get_categorie(self, nom_categorie):
+        return self.categories.get(nom_categorie)
+
+    def get_magasin(self, url_magasin):
+        return self.magasins.get(url_magasin)
+
+    def get_marque(self, nom_marque):
+        return self.marques.get(nom_marque)
+
+    def get_produit(self, nom_produit, marque, code_barre, id_categorie):
+        if code_barre:
+            return self.produits_ean.get(code_barre)
+        # marque vide == marque NULL, comme l'index produit_sans_code_barres_key
+        return self.produits_nom.get((nom_produit, marque or None, id_categorie))
+
+    def remember_produit(self, id_produit, nom_produit, marque, code_barre, id_categorie):
+        if code_barre:
+            self.produits_ean.setdefault(code_barre, id_produit)
+        else:
+            self.produits_nom.setdefault((nom_produit, marque or None, id_categorie), id_produit)
+
+    # ---------- résolution en lot des absents ----------
+
+    def resolve_categories(self, cur, noms):
+        missing = sorted({n for n in noms if n not in self.categories})
+        if not missing:
+            return 0
+
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO categorie (nom_categorie)
+            VALUES %s
+            ON CONFLICT (nom_categorie) DO UPDATE SET nom_categorie = EXCLUDED.nom_categorie
+            RETURNING id_categorie, nom_categorie;
+            """,
+            [(n,) for n in missing],
+            page_size=BATCH_SIZE,
+            fetch=True,
+        )
+        for id_cat, nom in rows:
+            self.categories[nom] = id_cat
+        return len(rows)
+
+    def resolve_magasins(self, cur, magasins):
+        # magasins: itérable de (nom_magasin, enseigne, url_magasin), la 1re occurrence gagne
+        missing = {}
+        for nom, enseigne, url in magasins:
+            if url not in self.magasins:
+                missing.setdefault(url, (nom, enseigne, url))
+        if not missing:
+            return 0
+
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO magasin (nom_magasin, enseigne, url_magasin)
+            VALUES %s
+            ON CONFLICT (url_magasin) DO UPDATE SET url_magasin = EXCLUDED.url_magasin
+            RETURNING id_magasin, url_magasin;
+            """,
+            [missing[url] for url in sorted(missing)],
+            page_size=BATCH_SIZE,
+            fetch=True,
+        )
+        for id_mag, url in rows:
+            self.magasins[url] = id_mag
+        return len(rows)
+
+    def resolve_marques(self, cur, noms):
+        missing = sorted({n for n in noms if n and n not in self.marques})
+        if not missing:
+            return 0
+
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO marque (nom_marque)
+            VALUES %s
+            ON CONFLICT (nom_marque) DO UPDATE SET nom_marque = EXCLUDED.nom_marque
+            RETURNING id_marque, nom_marque;
+            """,
+            [(n,) for n in missing],
+            page_size=BATCH_SIZE,
+            fetch=True,
+        )
+        for id_marque, nom in rows:
+            self.marques[nom] = id_marque
+        return len(rows)
+
+    def resolve_produits(self, cur, produits):
+        # produits: itérable de (nom_produit, marque, code_barre, id_categorie), la 1re occurrence gagne
+        # la marque "dimension" (id_marque) est celle du CSV, sinon devinée depuis le nom
+        produits = [(nom, marque or None, code_barre, id_cat, marque_dimension(nom, marque))
+                    for nom, marque, code_barre, id_cat in produits]
+        self.resolve_marques(cur, (p[4] for p in produits))
+
+        avec_ean, sans_ean, a_completer = {}, {}, {}
+        for nom, marque, code_barre, id_cat, dim in produits:
+            id_marque = self.get_marque(dim)
+            id_prod = self.get_produit(nom, marque, code_barre, id_cat)
+            if id_prod is not None:
+                if id_prod in self.sans_marque and id_marque is not None:
+                    a_completer.setdefault(id_prod, id_marque)
+                continue
+            if code_barre:
+                avec_ean.setdefault(code_barre, (nom, marque, code_barre, id_cat, id_marque))
+            else:
+                sans_ean.setdefault((nom, marque, id_cat), (nom, marque, None, id_cat, id_marque))
+
+        rows = []
+        if avec_ean:
+            rows += execute_values(
+                cur,
+                """
+                INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+                VALUES %s
+                ON CONFLICT (code_barres) DO UPDATE
+                SET marque = COALESCE(produit.marque, EXCLUDED.marque),
+                    id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
+                RETURNING id_produit, nom_produit, marque, code_barres, id_categorie, id_marque;
+                """,
+                [avec_ean[ean] for ean in sorted(avec_ean)],
+                page_size=BATCH_SIZE,
+                fetch=True,
+            )
+        if sans_ean:
+            rows += execute_values(
+                cur,
+                """
+                INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+                VALUES %s
+                ON CONFLICT (nom_produit, (COALESCE(marque, '')), id_categorie) WHERE code_barres IS NULL
+                DO UPDATE SET id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
+                RETURNING id_produit, nom_produit, marque, code_barres, id_categorie, id_marque;
+                """,
+                # même ordre que la clé unique : marque NULL == ''
+                [sans_ean[k] for k in sorted(sans_ean, key=lambda k: (k[0], k[1] or "", k[2]))],
+                page_size=BATCH_SIZE,
+                fetch=True,
+            )
+
+        for id_prod, nom, marque, code_barre, id_cat, id_marque in rows:
+            self.remember_produit(id_prod, nom, marque, code_barre, id_cat)
+            if id_marque is None:
+                self.sans_marque.add(id_prod)
+
+        # produits déjà connus mais créés avant la dimension marque
+        if a_completer:
+            execute_values(
+                cur,
+                """
+                UPDATE produit p SET id_marque = v.id_marque
+                FROM (VALUES %s) AS v (id_produit, id_marque)
+                WHERE p.id_produit = v.id_produit AND p.id_marque IS NULL;
+                """,
+                sorted(a_completer.items()),
+                page_size=BATCH_SIZE,
+            )
+            self.sans_marque.difference_update(a_completer)
+        return len(rows)
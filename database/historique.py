@@ -0,0 +1,92 @@
+# historique.py
+# Historique des prix d'un produit, par magasin, pour les graphiques de l'app.
+# ✅ agrégation date_trunc (jour / semaine / mois) : min, moyenne, max, nb de relevés
+# ✅ index observation_prix (id_produit, observed_at) -> seules les lignes du produit sont lues
+# ✅ séries longues réduites par LTTB (Largest-Triangle-Three-Buckets) : la forme de la courbe
+#    est conservée avec quelques centaines de points
+
+# pas demandé -> champ date_trunc
+PAS = {
+    "jour": "day", "day": "day",
+    "semaine": "week", "week": "week",
+    "mois": "month", "month": "month",
+}
+
+
+def history_query(id_produit, pas="day", tz="Europe/Paris", debut=None, fin=None, magasin_id=None):
+    # -> (sql, params) ; une ligne par (magasin, période), triée par magasin puis date
+    sql = """
+    SELECT
+      op.id_magasin,
+      -- début de période en heure locale (sans fuseau) : le 1er du mois reste le 1er
+      date_trunc(%s, op.observed_at, %s) AT TIME ZONE %s AS periode,
+      MIN(op.prix) AS prix_min,
+      ROUND(AVG(op.prix), 2) AS prix_moy,
+      MAX(op.prix) AS prix_max,
+      COUNT(*) AS nb
+    FROM observation_prix op
+    WHERE op.id_produit = %s
+    """
+    params = [pas, tz, tz, id_produit]
+
+    if debut is not None:
+        sql += " AND op.observed_at >= %s"
+        params.append(debut)
+    if fin is not None:
+        sql += " AND op.observed_at < %s"
+        params.append(fin)
+    if magasin_id is not None:
+        sql += " AND op.id_magasin = %s"
+        params.append(magasin_id)
+
+    sql += """
+    GROUP BY op.id_magasin, periode
+    ORDER BY op.id_magasin, periode
+    """
+    return sql, params
+
+
+def lttb(xs, ys, threshold):
+    # -> indices des points conservés (premier et dernier toujours gardés)
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    kept = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # moyenne du bucket suivant = 3e sommet du triangle
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[start:end]) / (end - start)
+        avg_y = sum(ys[start:end]) / (end - start)
+
+        # bucket courant : le point qui forme le plus grand triangle avec a et la moyenne
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+
+    kept.append(n - 1)
+    return kept
+
+
+def group_series(rows, max_points):
+    # lignes (triées par magasin) -> {id_magasin: [lignes]}, chaque série réduite à max_points
+    series = {}
+    for r in rows:
+        series.setdefault(r["id_magasin"], []).append(r)
+
+    out = {}
+    for id_magasin, points in series.items():
+        xs = [p["periode"].timestamp() for p in points]
+        ys = [float(p["prix_moy"]) for p in points]
+        out[id_magasin] = (len(points), [points[i] for i in lttb(xs, ys, max_points)])
+    return out
@@ -0,0 +1,137 @@
+-- insert_data.sql
+-- Schéma de la base SAE5.6 (prix Carrefour / Monoprix)
+-- ✅ rejouable : psql -d "SAE5.6" -f database/insert_data.sql
+-- ✅ contraintes d'unicité utilisées par les importers (INSERT ... ON CONFLICT)
+--
+-- Sur une base existante, la création d'un index unique échoue s'il reste des doublons
+-- (ex: deux imports lancés en même temps avant ce schéma) : les fusionner d'abord.
+
+CREATE TABLE IF NOT EXISTS categorie (
+    id_categorie  SERIAL PRIMARY KEY,
+    nom_categorie TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS magasin (
+    id_magasin  SERIAL PRIMARY KEY,
+    nom_magasin TEXT NOT NULL,
+    enseigne    TEXT,
+    url_magasin TEXT NOT NULL
+);
+
+-- marques normalisées (database/marques.py) : filtre et liste déroulante de l'app par clé
+CREATE TABLE IF NOT EXISTS marque (
+    id_marque  SERIAL PRIMARY KEY,
+    nom_marque TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS produit (
+    id_produit   SERIAL PRIMARY KEY,
+    nom_produit  TEXT NOT NULL,
+    marque       TEXT,
+    code_barres  TEXT,
+    id_categorie INTEGER NOT NULL REFERENCES categorie (id_categorie),
+    id_marque    INTEGER REFERENCES marque (id_marque)
+);
+
+CREATE TABLE IF NOT EXISTS observation_prix (
+    id_observation BIGSERIAL PRIMARY KEY,
+    id_produit     INTEGER NOT NULL REFERENCES produit (id_produit),
+    id_magasin     INTEGER NOT NULL REFERENCES magasin (id_magasin),
+    prix           NUMERIC(10, 2) NOT NULL,
+    source         TEXT,
+    observed_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- dernier prix connu par (produit, magasin), tenu à jour par les importers
+CREATE TABLE IF NOT EXISTS prix_courant (
+    id_produit     INTEGER NOT NULL REFERENCES produit (id_produit),
+    id_magasin     INTEGER NOT NULL REFERENCES magasin (id_magasin),
+    prix           NUMERIC(10, 2) NOT NULL,
+    observed_at    TIMESTAMPTZ NOT NULL,
+    id_observation BIGINT NOT NULL,
+    PRIMARY KEY (id_produit, id_magasin)
+);
+
+-- version des données : +1 à chaque import terminé (sert à invalider les caches de l'app)
+CREATE TABLE IF NOT EXISTS data_version (
+    id         SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version    BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO data_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+-- bases créées avant ce fichier
+ALTER TABLE observation_prix ADD COLUMN IF NOT EXISTS observed_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE produit ADD COLUMN IF NOT EXISTS id_marque INTEGER REFERENCES marque (id_marque);
+
+
+-- =========================
+-- UNICITÉ (cibles des ON CONFLICT)
+-- =========================
+
+CREATE UNIQUE INDEX IF NOT EXISTS categorie_nom_categorie_key ON categorie (nom_categorie);
+
+-- un magasin est identifié par son url
+CREATE UNIQUE INDEX IF NOT EXISTS magasin_url_magasin_key ON magasin (url_magasin);
+
+-- une marque = un nom normalisé (espaces en trop retirés)
+CREATE UNIQUE INDEX IF NOT EXISTS marque_nom_marque_key ON marque (nom_marque);
+
+-- code-barres = meilleur identifiant produit
+CREATE UNIQUE INDEX IF NOT EXISTS produit_code_barres_key ON produit (code_barres);
+
+-- produits sans code-barres (Monoprix) : nom + marque + catégorie
+-- COALESCE : une marque NULL doit entrer en conflit avec une autre marque NULL
+CREATE UNIQUE INDEX IF NOT EXISTS produit_sans_code_barres_key
+    ON produit (nom_produit, (COALESCE(marque, '')), id_categorie)
+    WHERE code_barres IS NULL;
+
+
+-- =========================
+-- INDEX DE JOINTURE
+-- =========================
+
+CREATE INDEX IF NOT EXISTS produit_id_categorie_idx ON produit (id_categorie);
+CREATE INDEX IF NOT EXISTS produit_id_marque_idx ON produit (id_marque);
+-- tri par nom + pagination par curseur (nom_produit, id_produit)
+CREATE INDEX IF NOT EXISTS produit_nom_id_idx ON produit (nom_produit, id_produit);
+-- historique d'un produit (date_trunc par jour/semaine/mois) ; remplace l'index sur id_produit seul
+CREATE INDEX IF NOT EXISTS observation_prix_produit_date_idx ON observation_prix (id_produit, observed_at);
+DROP INDEX IF EXISTS observation_prix_id_produit_idx;
+CREATE INDEX IF NOT EXISTS observation_prix_id_magasin_idx ON observation_prix (id_magasin);
+CREATE INDEX IF NOT EXISTS prix_courant_id_magasin_idx ON prix_courant (id_magasin);
+
+
+-- =========================
+-- REMPLISSAGE INITIAL prix_courant (bases existantes)
+-- =========================
+
+INSERT INTO prix_courant (id_produit, id_magasin, prix, observed_at, id_observation)
+SELECT DISTINCT ON (op.id_produit, op.id_magasin)
+       op.id_produit, op.id_magasin, op.prix, op.observed_at, op.id_observation
+FROM observation_prix op
+ORDER BY op.id_produit, op.id_magasin, op.observed_at DESC, op.id_observation DESC
+ON CONFLICT (id_produit, id_magasin) DO NOTHING;
+
+
+-- =========================
+-- REMPLISSAGE INITIAL marque / produit.id_marque (bases existantes)
+-- =========================
+-- les produits sans marque (Monoprix) la reçoivent au prochain import (devinée depuis le nom)
+
+INSERT INTO marque (nom_marque)
+SELECT DISTINCT regexp_replace(btrim(marque), '\s+', ' ', 'g')
+FROM produit
+WHERE marque IS NOT NULL AND btrim(marque) <> ''
+ON CONFLICT (nom_marque) DO NOTHING;
+
+UPDATE produit p
+SET id_marque = m.id_marque
+FROM marque m
+WHERE p.id_marque IS NULL
+  AND p.marque IS NOT NULL
+  AND m.nom_marque = regexp_replace(btrim(p.marque), '\s+', ' ', 'g');
+
+
+-- ancienne table de staging partagée de l'import en masse (remplacée par une table TEMP par import)
+DROP TABLE IF EXISTS staging_carrefour;
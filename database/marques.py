@@ -0,0 +1,44 @@
+# marques.py
+# Dimension marque : une ligne par marque normalisée (table marque, produit.id_marque).
+# ✅ même normalisation pour les deux importers et pour le remplissage initial (insert_data.sql)
+# ✅ marque absente du CSV (Monoprix) -> devinée depuis le nom du produit
+
+import re
+
+
+def guess_marque_from_name(nom_produit: str):
+    if not nom_produit or nom_produit == "N/A":
+        return None
+
+    s = nom_produit.replace("\u00a0", " ").strip()
+    tokens = [t for t in s.split(" ") if t]
+
+    tail = []
+    for t in reversed(tokens):
+        letters = re.sub(r"[^A-Za-zÀ-ÖØ-öø-ÿ]", "", t)
+        if letters and letters.upper() == letters:
+            tail.append(t)
+            if len(tail) >= 3:
+                break
+        else:
+            break
+
+    if not tail:
+        return None
+
+    tail = list(reversed(tail))
+    marque = " ".join(tail).strip(" ,;-")
+    return marque if marque else None
+
+
+def normalize_marque(marque):
+    # espaces en trop retirés : SQL équivalent regexp_replace(btrim(marque), '\s+', ' ', 'g')
+    if marque is None:
+        return None
+    marque = re.sub(r"\s+", " ", str(marque)).strip()
+    return marque or None
+
+
+def marque_dimension(nom_produit, marque):
+    # marque fournie par le scraper, sinon devinée depuis le nom
+    return normalize_marque(marque) or normalize_marque(guess_marque_from_name(nom_produit))
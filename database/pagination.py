@@ -0,0 +1,113 @@
+# pagination.py
+# Pagination par curseur (keyset) pour la liste de produits de l'app.
+# ✅ "page suivante" = lignes strictement après la dernière ligne affichée, dans l'ordre du tri
+# ✅ départage sur id_produit -> ordre total, aucune ligne sautée ni répétée
+# -> la page 500 coûte comme la page 1 (pas d'OFFSET qui relit tout ce qui précède)
+#
+# Une clé de tri = (expression SQL, paramètres de l'expression, "ASC"/"DESC", nullable).
+# Les clés nullables sont triées NULLS LAST.
+
+import base64
+import json
+from decimal import Decimal
+
+
+def order_by_clause(keys, id_col):
+    parts, params = [], []
+    for expr, expr_params, direction, nullable in keys:
+        parts.append(f"{expr} {direction}" + (" NULLS LAST" if nullable else ""))
+        params.extend(expr_params)
+    parts.append(f"{id_col} {keys[0][2]}")
+    return ", ".join(parts), params
+
+
+def keyset_condition(keys, values, id_col, id_value):
+    # -> condition SQL "la ligne vient après (values..., id_value)" et ses paramètres
+    all_keys = list(keys) + [(id_col, [], keys[0][2], False)]
+    all_values = list(values) + [id_value]
+
+    # clés toutes non nulles et dans le même sens : comparaison de lignes, utilisable par un index
+    if all(not k[3] for k in keys) and len({k[2] for k in keys}) == 1:
+        op = ">" if keys[0][2] == "ASC" else "<"
+        exprs = ", ".join(k[0] for k in all_keys)
+        marks = ", ".join(["%s"] * len(all_values))
+        params = [p for k in all_keys for p in k[1]] + all_values
+        return f"({exprs}) {op} ({marks})", params
+
+    # cas général : (k1 après v1) OU (k1 = v1 ET k2 après v2) OU ...
+    clauses, params = [], []
+    eq_sql, eq_params = [], []
+    for (expr, expr_params, direction, nullable), v in zip(all_keys, all_values):
+        op = ">" if direction == "ASC" else "<"
+        if v is None:
+            # NULLS LAST : aucune valeur de cette clé ne vient après NULL
+            eq_sql.append(f"{expr} IS NULL")
+            eq_params.extend(expr_params)
+            continue
+
+        if nullable:
+            after = f"({expr} {op} %s OR {expr} IS NULL)"
+            after_params = expr_params + [v] + expr_params
+        else:
+            after = f"{expr} {op} %s"
+            after_params = expr_params + [v]
+        clauses.append("(" + " AND ".join(eq_sql + [after]) + ")")
+        params.extend(eq_params + after_params)
+
+        eq_sql.append(f"{expr} = %s")
+        eq_params.extend(expr_params + [v])
+
+    if not clauses:
+        return "FALSE", []
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+# ---------- jeton opaque dans l'URL ----------
+
+def _to_json(v):
+    if isinstance(v, Decimal):
+        return {"d": str(v)}
+    return v
+
+
+_INVALID = object()
+
+# types acceptés pour une valeur de clé de tri décodée (jeton modifiable par le client)
+NUMBER = (int, float, Decimal, type(None))   # prix, pertinence
+TEXT = (str,)                                # nom
+
+
+def _from_json(v):
+    if isinstance(v, dict):
+        d = Decimal(v["d"]) if isinstance(v.get("d"), str) else None
+        return d if d is not None and d.is_finite() else _INVALID
+    return v
+
+
+def _valid(v, types):
+    return v is not _INVALID and not isinstance(v, bool) and isinstance(v, types)
+
+
+def encode_cursor(sort: str, values, id_value) -> str:
+    payload = {"s": sort, "v": [_to_json(v) for v in values], "id": id_value}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort: str, types):
+    # -> (values, id_value), ou None si le jeton est invalide, d'un autre tri ou mal typé
+    # types : un tuple de types acceptés par clé de tri (NUMBER, TEXT)
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        values = [_from_json(v) for v in payload["v"]]
+        id_value = payload["id"]
+    except (ValueError, KeyError, TypeError, ArithmeticError):
+        return None
+    if payload.get("s") != sort or not isinstance(payload["v"], list) or len(values) != len(types):
+        return None
+    if not all(_valid(v, t) for v, t in zip(values, types)):
+        return None
+    if isinstance(id_value, bool) or not isinstance(id_value, int) or not 0 <= id_value < 2**63:
+        return None
+    return values, id_value
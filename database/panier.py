@@ -0,0 +1,182 @@
+# panier.py
+# Optimisation d'un panier : où acheter une liste de produits le moins cher.
+# ✅ matrice des prix (articles x magasins) chargée en UNE requête sur prix_courant
+# ✅ meilleur magasin unique + meilleure répartition sur au plus k magasins (NumPy)
+# ✅ article absent d'un magasin -> pénalité (prix max observé x MISSING_PENALTY_FACTOR)
+#
+# Répartition : exacte pour k <= 2 (toutes les paires), sinon ajout glouton du magasin
+# qui fait le plus baisser le total puis échanges 1-pour-1 tant que ça améliore.
+
+import numpy as np
+
+MISSING_PENALTY_FACTOR = 1.5   # article introuvable dans le(s) magasin(s) choisi(s)
+MAX_K = 5
+PAIR_BLOCK = 8    # magasins traités d'un coup pour k = 2 (mémoire ~ 8 x magasins x articles)
+
+
+def load_price_matrix(cur, articles, magasin_ids=None):
+    # articles : [{"ean": ... ou "id_produit": ..., "quantite": n}, ...]
+    # -> (infos par article, ids magasins, matrice prix (NaN = pas de prix))
+    eans = [a.get("ean") for a in articles]
+    ids = [a.get("id_produit") for a in articles]
+
+    sql = """
+    WITH panier AS (
+      SELECT i.idx, COALESCE(i.id, p.id_produit) AS id_produit
+      FROM unnest(%s::text[], %s::int[]) WITH ORDINALITY AS i(ean, id, idx)
+      LEFT JOIN produit p ON i.id IS NULL AND p.code_barres = i.ean
+    )
+    SELECT b.idx, pr.id_produit, pr.nom_produit, pr.code_barres, pc.id_magasin, pc.prix
+    FROM panier b
+    LEFT JOIN produit pr ON pr.id_produit = b.id_produit
+    LEFT JOIN prix_courant pc ON pc.id_produit = pr.id_produit
+    """
+    params = [eans, ids]
+    if magasin_ids:
+        # dans la condition du LEFT JOIN : l'article reste listé même sans prix dans ces magasins
+        sql += " AND pc.id_magasin = ANY(%s)"
+        params.append(list(magasin_ids))
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+
+    infos = [None] * len(articles)
+    cells = []
+    for r in rows:
+        if isinstance(r, dict):
+            r = (r["idx"], r["id_produit"], r["nom_produit"], r["code_barres"], r["id_magasin"], r["prix"])
+        idx, id_produit, nom, ean, id_magasin, prix = r
+        i = idx - 1
+        if id_produit is not None and infos[i] is None:
+            infos[i] = {"id_produit": id_produit, "nom_produit": nom, "code_barres": ean}
+        if id_magasin is not None:
+            cells.append((i, id_magasin, float(prix)))
+
+    stores = sorted({m for _, m, _ in cells})
+    col = {m: j for j, m in enumerate(stores)}
+    prices = np.full((len(articles), len(stores)), np.nan)
+    for i, m, p in cells:
+        prices[i, col[m]] = p
+    return infos, stores, prices
+
+
+def cost_matrix(prices, quantities, penalty=None):
+    # coût de chaque article dans chaque magasin (quantité comprise), pénalité si absent
+    # penalty : prix unitaire imposé pour un article manquant (sinon prix max x facteur)
+    q = np.asarray(quantities, dtype=float)[:, None]
+    if penalty is None:
+        fallback = np.nanmax(prices, axis=1) * MISSING_PENALTY_FACTOR
+    else:
+        fallback = np.full(prices.shape[0], float(penalty))
+    unit = np.where(np.isnan(prices), fallback[:, None], prices)
+    return unit * q
+
+
+def best_single(costs):
+    totals = costs.sum(axis=0)
+    order = np.argsort(totals, kind="stable")
+    return order, totals
+
+
+def _split_total(costs, chosen):
+    return costs[:, chosen].min(axis=1).sum()
+
+
+def best_split(costs, k):
+    # -> (colonnes choisies, total)
+    n_stores = costs.shape[1]
+    k = max(1, min(k, MAX_K, n_stores))
+
+    if k == 1:
+        order, totals = best_single(costs)
+        return [int(order[0])], float(totals[order[0]])
+
+    if k == 2:
+        # toutes les paires (a <= b), par blocs de PAIR_BLOCK magasins ; magasins en lignes
+        # pour que la somme sur les articles lise de la mémoire contiguë
+        ct = np.ascontiguousarray(costs.T)
+        buf = np.empty((PAIR_BLOCK, n_stores, ct.shape[1]))
+        best = (None, np.inf)
+        for start in range(0, n_stores, PAIR_BLOCK):
+            block, rest = ct[start:start + PAIR_BLOCK], ct[start:]
+            pair = buf[:len(block), :len(rest)]
+            np.minimum(block[:, None, :], rest[None, :, :], out=pair)
+            totals = pair.sum(axis=2)
+            a, b = np.unravel_index(int(np.argmin(totals)), totals.shape)
+            if totals[a, b] < best[1]:
+                a, b = int(start + a), int(start + b)
+                best = ([a] if a == b else [a, b], float(totals[a - start, b - start]))
+        return best
+
+    # glouton : meilleur magasin seul, puis celui qui fait le plus baisser le total
+    _, totals = best_single(costs)
+    chosen = [int(np.argmin(totals))]
+    current = costs[:, chosen[0]].copy()
+    while len(chosen) < k:
+        gains = np.minimum(current[:, None], costs).sum(axis=0)
+        j = int(np.argmin(gains))
+        if gains[j] >= current.sum() or j in chosen:
+            break
+        chosen.append(j)
+        current = np.minimum(current, costs[:, j])
+
+    # amélioration locale : remplacer un magasin choisi par un autre
+    total = float(current.sum())
+    improved = True
+    while improved:
+        improved = False
+        for pos in range(len(chosen)):
+            others = chosen[:pos] + chosen[pos + 1:]
+            base = costs[:, others].min(axis=1) if others else np.full(costs.shape[0], np.inf)
+            totals = np.minimum(base[:, None], costs).sum(axis=0)
+            j = int(np.argmin(totals))
+            if totals[j] < total - 1e-9 and j not in chosen:
+                chosen[pos] = j
+                total = float(totals[j])
+                improved = True
+    return chosen, _split_total(costs, chosen)
+
+
+def optimize_basket(articles, infos, stores, prices, k=2, penalty=None, top=10):
+    # -> dict prêt pour le JSON (ids magasins ; les noms sont ajoutés par l'app)
+    quantities = [max(1, int(a.get("quantite") or 1)) for a in articles]
+    known = [i for i in range(len(articles)) if infos[i] is not None and not np.all(np.isnan(prices[i]))]
+    introuvables = [dict(articles[i], **(infos[i] or {})) for i in range(len(articles)) if i not in known]
+
+    result = {"introuvables": introuvables, "meilleur_magasin": None, "repartition": None, "classement": []}
+    if not known or not stores:
+        return result
+
+    sub = prices[known]
+    q = [quantities[i] for i in known]
+    costs = cost_matrix(sub, q, penalty)
+
+    def lines(cols):
+        # article -> magasin le moins cher parmi cols (None si absent partout)
+        out = []
+        for r, i in enumerate(known):
+            row = sub[r, cols]
+            j = None if np.all(np.isnan(row)) else cols[int(np.nanargmin(row))]
+            out.append(dict(infos[i], quantite=q[r],
+                            id_magasin=stores[j] if j is not None else None,
+                            prix=float(sub[r, j]) if j is not None else None))
+        return out
+
+    def summary(cols, total):
+        detail = lines(cols)
+        return {
+            "magasins": [stores[j] for j in cols],
+            "total": round(float(total), 2),
+            "manquants": [d for d in detail if d["id_magasin"] is None],
+            "articles": [d for d in detail if d["id_magasin"] is not None],
+        }
+
+    order, totals = best_single(costs)
+    result["meilleur_magasin"] = summary([int(order[0])], totals[order[0]])
+    result["classement"] = [
+        {"id_magasin": stores[j], "total": round(float(totals[j]), 2),
+         "manquants": int(np.isnan(sub[:, j]).sum())}
+        for j in order[:top]
+    ]
+    cols, total = best_split(costs, k)
+    result["repartition"] = summary(sorted(cols), total)
+    return result
@@ -0,0 +1,134 @@
+# pool.py
+# Pool de connexions PostgreSQL partagé par tout le processus (app Flask).
+# ✅ min / max connexions (au-delà : attente bornée au lieu d'ouvrir un backend de plus)
+# ✅ vérification de la connexion à la sortie du pool
+# ✅ compteurs de saturation (attentes, timeouts, pic d'utilisation)
+
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, checkout_timeout=5.0, ping_after=30.0, **conn_kwargs):
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        # une connexion restée inactive plus longtemps est testée par un SELECT 1
+        self.ping_after = ping_after
+
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,               # checkouts qui ont dû attendre une connexion libre
+            "timeouts": 0,            # attentes abandonnées après checkout_timeout
+            "in_use": 0,
+            "max_in_use": 0,
+            "broken_replaced": 0,     # connexions mortes détectées et remplacées
+        }
+
+    # ---------- checkout / retour ----------
+
+    def getconn(self):
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.checkout_timeout):
+                self._count("timeouts")
+                raise PoolTimeout(f"pool saturé ({self.maxconn} connexions) après {self.checkout_timeout}s")
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["in_use"] += 1
+            self.stats["max_in_use"] = max(self.stats["max_in_use"], self.stats["in_use"])
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            close = True
+
+        self._last_used[id(conn)] = time.monotonic()
+        if close or conn.closed:
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=close or bool(conn.closed))
+
+        with self._lock:
+            self.stats["in_use"] -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        self._pool.closeall()
+        self._last_used.clear()
+
+    # ---------- santé ----------
+
+    def _checkout_healthy(self):
+        # après un redémarrage du serveur, plusieurs connexions du pool peuvent être mortes
+        for _ in range(self.maxconn):
+            conn = self._pool.getconn()
+            if self._is_alive(conn):
+                return conn
+
+            self._count("broken_replaced")
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        return self._pool.getconn()
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        last = self._last_used.get(id(conn))
+        if last is not None and time.monotonic() - last < self.ping_after:
+            return True
+
+        # connexion neuve ou inactive depuis longtemps : le serveur a pu la couper
+        try:
+            # curseur de base : le ping fait partie de l'emprunt, pas des requêtes de l'app
+            with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, maxconn=self.maxconn)
@@ -1,7 +1,20 @@
 import os
+import io
 import glob
 import pandas as pd
 import psycopg2
+from psycopg2.extras import execute_values
+
+try:
+    from database.dimensions import DimensionCache
+    from database.marques import marque_dimension
+    from database.prix_courant import last_observation_id, update_prix_courant
+    from database.version import bump_data_version
+except ImportError:  # lancé directement : python database/xxx.py
+    from dimensions import DimensionCache
+    from marques import marque_dimension
+    from prix_courant import last_observation_id, update_prix_courant
+    from version import bump_data_version
 
 PG_HOST = "localhost"
 PG_PORT = 5432
@@ -9,6 +22,14 @@ PG_DB   = "SAE5.6"
 PG_USER = "postgres"
 PG_PASS = "2005"
 
+# "bulk" : COPY dans une table de staging temporaire puis INSERT ... SELECT ensemblistes
+# "ligne" : ancien import ligne par ligne (utile pour déboguer une ligne précise)
+IMPORT_MODE = "bulk"
+STAGING_TABLE = "staging_carrefour"
+SOURCE = "carrefour_scrape"
+
+STAGING_COLUMNS = ["produit", "marque", "code_barre", "prix_num", "categorie", "magasin", "url_magasin", "marque_dim"]
+
 
 def find_latest_csv():
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -26,32 +47,38 @@ def get_conn():
     )
 
 
-# ---------- helpers sans ON CONFLICT ----------
+# ---------- helpers (upserts ON CONFLICT, voir database/insert_data.sql) ----------
+# DO UPDATE "à vide" plutôt que DO NOTHING : RETURNING renvoie aussi la ligne existante
 
-def get_or_create_categorie(cur, nom_categorie: str) -> int:
-    cur.execute("SELECT id_categorie FROM categorie WHERE nom_categorie = %s;", (nom_categorie,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
+def get_or_create_categorie(cur, nom_categorie: str, cache: DimensionCache = None) -> int:
+    if cache is not None:
+        # cache préchargé : 0 requête si connue, sinon INSERT ... RETURNING
+        cache.resolve_categories(cur, [nom_categorie])
+        return cache.get_categorie(nom_categorie)
 
     cur.execute(
-        "INSERT INTO categorie (nom_categorie) VALUES (%s) RETURNING id_categorie;",
+        """
+        INSERT INTO categorie (nom_categorie) VALUES (%s)
+        ON CONFLICT (nom_categorie) DO UPDATE SET nom_categorie = EXCLUDED.nom_categorie
+        RETURNING id_categorie;
+        """,
         (nom_categorie,)
     )
     return cur.fetchone()[0]
 
 
-def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str) -> int:
-    # on identifie un magasin par son url (logique)
-    cur.execute("SELECT id_magasin FROM magasin WHERE url_magasin = %s;", (url_magasin,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
+def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str,
+                          cache: DimensionCache = None) -> int:
+    if cache is not None:
+        cache.resolve_magasins(cur, [(nom_magasin, enseigne, url_magasin)])
+        return cache.get_magasin(url_magasin)
 
+    # on identifie un magasin par son url (logique)
     cur.execute(
         """
         INSERT INTO magasin (nom_magasin, enseigne, url_magasin)
         VALUES (%s, %s, %s)
+        ON CONFLICT (url_magasin) DO UPDATE SET url_magasin = EXCLUDED.url_magasin
         RETURNING id_magasin;
         """,
         (nom_magasin, enseigne, url_magasin)
@@ -59,88 +86,284 @@ def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str
     return cur.fetchone()[0]
 
 
-def get_or_create_produit(cur, nom_produit: str, marque: str, code_barre: str, id_categorie: int) -> int:
+def get_or_create_marque(cur, nom_marque: str) -> int:
+    cur.execute(
+        """
+        INSERT INTO marque (nom_marque) VALUES (%s)
+        ON CONFLICT (nom_marque) DO UPDATE SET nom_marque = EXCLUDED.nom_marque
+        RETURNING id_marque;
+        """,
+        (nom_marque,)
+    )
+    return cur.fetchone()[0]
+
+
+def get_or_create_produit(cur, nom_produit: str, marque: str, code_barre: str, id_categorie: int,
+                          cache: DimensionCache = None) -> int:
+    marque = marque or None
+    if cache is not None:
+        cache.resolve_produits(cur, [(nom_produit, marque, code_barre, id_categorie)])
+        return cache.get_produit(nom_produit, marque, code_barre, id_categorie)
+
+    # marque normalisée (table marque) : celle du CSV, sinon devinée depuis le nom
+    dim = marque_dimension(nom_produit, marque)
+    id_marque = get_or_create_marque(cur, dim) if dim else None
+
     # si code_barres existe -> meilleur identifiant
     if code_barre:
-        cur.execute("SELECT id_produit FROM produit WHERE code_barres = %s;", (code_barre,))
-        row = cur.fetchone()
-        if row:
-            return row[0]
-
         cur.execute(
             """
-            INSERT INTO produit (nom_produit, marque, code_barres, id_categorie)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (code_barres) DO UPDATE
+            SET marque = COALESCE(produit.marque, EXCLUDED.marque),
+                id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
             RETURNING id_produit;
             """,
-            (nom_produit, marque, code_barre, id_categorie)
+            (nom_produit, marque, code_barre, id_categorie, id_marque)
         )
         return cur.fetchone()[0]
 
-    # sinon fallback: nom + marque + categorie
-    cur.execute(
-        """
-        SELECT id_produit
-        FROM produit
-        WHERE nom_produit = %s
-          AND (marque IS NOT DISTINCT FROM %s)
-          AND id_categorie = %s
-          AND code_barres IS NULL;
-        """,
-        (nom_produit, marque, id_categorie)
-    )
-    row = cur.fetchone()
-    if row:
-        return row[0]
-
+    # sinon fallback: nom + marque + categorie (index unique partiel code_barres IS NULL)
     cur.execute(
         """
-        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie)
-        VALUES (%s, %s, NULL, %s)
+        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+        VALUES (%s, %s, NULL, %s, %s)
+        ON CONFLICT (nom_produit, (COALESCE(marque, '')), id_categorie) WHERE code_barres IS NULL
+        DO UPDATE SET id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
         RETURNING id_produit;
         """,
-        (nom_produit, marque, id_categorie)
+        (nom_produit, marque, id_categorie, id_marque)
     )
     return cur.fetchone()[0]
 
 
-def insert_observation(cur, id_produit: int, id_magasin: int, prix: float, source: str = "carrefour_scrape"):
-    cur.execute(
-        """
-        INSERT INTO observation_prix (id_produit, id_magasin, prix, source)
-        VALUES (%s, %s, %s, %s);
-        """,
-        (id_produit, id_magasin, prix, source)
+def insert_observations(cur, observations):
+    # observations: liste de (id_produit, id_magasin, prix, source), envoyées par paquets
+    execute_values(
+        cur,
+        "INSERT INTO observation_prix (id_produit, id_magasin, prix, source) VALUES %s;",
+        observations,
+        page_size=1000,
     )
 
 
-def import_csv(conn, csv_path):
-    df = pd.read_csv(csv_path)
+def load_dataframe(csv_path):
+    # code_barre en texte : sinon pandas le lit en float (3560070328970.0) et perd les zéros de tête
+    df = pd.read_csv(csv_path, dtype={"code_barre": str, "marque": str})
 
     df["prix_num"] = pd.to_numeric(df["prix_num"], errors="coerce")
     df = df.dropna(subset=["produit", "categorie", "magasin", "url_magasin", "prix_num"])
+    return df
+
+
+def import_csv(conn, csv_path):
+    df = load_dataframe(csv_path)
+
+    records = []
+    for _, r in df.iterrows():
+        produit = str(r["produit"]).strip()
+        categorie = str(r["categorie"]).strip()
+        magasin = str(r["magasin"]).strip()
+        url_magasin = str(r["url_magasin"]).strip()
+
+        marque = None if pd.isna(r.get("marque")) else str(r.get("marque")).strip()
+        code_barre = None if pd.isna(r.get("code_barre")) else str(r.get("code_barre")).strip()
+        if code_barre == "":
+            code_barre = None
+
+        prix = float(r["prix_num"])
+        records.append((produit, marque, code_barre, prix, categorie, magasin, url_magasin))
 
     with conn.cursor() as cur:
-        for _, r in df.iterrows():
-            produit = str(r["produit"]).strip()
-            categorie = str(r["categorie"]).strip()
-            magasin = str(r["magasin"]).strip()
-            url_magasin = str(r["url_magasin"]).strip()
+        # ids chargés une fois, absents créés en lot -> la boucle ne touche plus la base
+        cache = DimensionCache.load(cur)
+        cache.resolve_categories(cur, (r[4] for r in records))
+        cache.resolve_magasins(cur, ((r[5], "Carrefour", r[6]) for r in records))
+        cache.resolve_produits(cur, ((r[0], r[1], r[2], cache.get_categorie(r[4])) for r in records))
+
+        observations = []
+        for produit, marque, code_barre, prix, categorie, magasin, url_magasin in records:
+            id_cat = get_or_create_categorie(cur, categorie, cache)
+            id_mag = get_or_create_magasin(cur, magasin, "Carrefour", url_magasin, cache)
+            id_prod = get_or_create_produit(cur, produit, marque, code_barre, id_cat, cache)
+            observations.append((id_prod, id_mag, prix, SOURCE))
+
+        after_id = last_observation_id(cur)
+        insert_observations(cur, observations)
+        update_prix_courant(cur, after_id)
+        # invalide les caches de l'app (listes déroulantes, etc.)
+        bump_data_version(cur)
+
+    conn.commit()
+
+
+# ---------- import en masse (COPY + INSERT ... SELECT) ----------
+
+def to_staging_frame(df):
+    out = pd.DataFrame(index=df.index)
+    for col in STAGING_COLUMNS:
+        if col == "prix_num":
+            out[col] = df[col].astype(float)
+            continue
+        if col == "marque_dim":
+            # marque normalisée (table marque) : celle du CSV, sinon devinée depuis le nom
+            out[col] = [marque_dimension(p, None if pd.isna(m) else m)
+                        for p, m in zip(out["produit"], out["marque"])]
+            continue
+        if col not in df.columns:
+            out[col] = None
+            continue
+        out[col] = df[col].map(lambda v: None if pd.isna(v) else (str(v).strip() or None))
+    return out
+
+
+def create_staging_table(cur):
+    # TEMP ... ON COMMIT DROP : une table privée par session, supprimée au COMMIT
+    # -> pas de verrou partagé ni de course à la création entre deux imports parallèles
+    cur.execute(f"""
+        CREATE TEMP TABLE {STAGING_TABLE} (
+            ligne       BIGSERIAL,
+            produit     TEXT,
+            marque      TEXT,
+            code_barre  TEXT,
+            prix_num    NUMERIC,
+            categorie   TEXT,
+            magasin     TEXT,
+            url_magasin TEXT,
+            marque_dim  TEXT
+        ) ON COMMIT DROP;
+    """)
+
+
+def copy_to_staging(cur, df):
+    buf = io.StringIO()
+    to_staging_frame(df).to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buf
+    )
+    cur.execute(f"ANALYZE {STAGING_TABLE};")
 
-            marque = None if pd.isna(r.get("marque")) else str(r.get("marque")).strip()
-            code_barre = None if pd.isna(r.get("code_barre")) else str(r.get("code_barre")).strip()
-            if code_barre == "":
-                code_barre = None
 
-            prix = float(r["prix_num"])
+def resolve_staging(cur, enseigne: str, source: str) -> dict:
+    # ON CONFLICT DO NOTHING : les clés déjà en base (ou créées par un import parallèle) sont ignorées
+    stats = {}
 
-            id_cat = get_or_create_categorie(cur, categorie)
-            id_mag = get_or_create_magasin(cur, magasin, "Carrefour", url_magasin)
-            id_prod = get_or_create_produit(cur, produit, marque, code_barre, id_cat)
+    cur.execute(f"""
+        INSERT INTO categorie (nom_categorie)
+        SELECT DISTINCT s.categorie
+        FROM {STAGING_TABLE} s
+        ON CONFLICT (nom_categorie) DO NOTHING;
+    """)
+    stats["categories"] = cur.rowcount
 
-            insert_observation(cur, id_prod, id_mag, prix)
+    # on identifie un magasin par son url (logique), le nom vient de la 1re ligne du CSV
+    cur.execute(f"""
+        INSERT INTO magasin (nom_magasin, enseigne, url_magasin)
+        SELECT DISTINCT ON (s.url_magasin) s.magasin, %s, s.url_magasin
+        FROM {STAGING_TABLE} s
+        ORDER BY s.url_magasin, s.ligne
+        ON CONFLICT (url_magasin) DO NOTHING;
+    """, (enseigne,))
+    stats["magasins"] = cur.rowcount
+
+    cur.execute(f"""
+        INSERT INTO marque (nom_marque)
+        SELECT DISTINCT s.marque_dim
+        FROM {STAGING_TABLE} s
+        WHERE s.marque_dim IS NOT NULL
+        ON CONFLICT (nom_marque) DO NOTHING;
+    """)
+    stats["marques"] = cur.rowcount
+
+    # si code_barres existe -> meilleur identifiant (1re occurrence dans le CSV)
+    cur.execute(f"""
+        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+        SELECT DISTINCT ON (s.code_barre) s.produit, s.marque, s.code_barre, c.id_categorie, mq.id_marque
+        FROM {STAGING_TABLE} s
+        JOIN categorie c ON c.nom_categorie = s.categorie
+        LEFT JOIN marque mq ON mq.nom_marque = s.marque_dim
+        WHERE s.code_barre IS NOT NULL
+        ORDER BY s.code_barre, s.ligne
+        ON CONFLICT (code_barres) DO NOTHING;
+    """)
+    stats["produits"] = cur.rowcount
+
+    # sinon fallback: nom + marque + categorie (index unique partiel code_barres IS NULL)
+    cur.execute(f"""
+        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+        SELECT DISTINCT ON (s.produit, COALESCE(s.marque, ''), c.id_categorie)
+               s.produit, s.marque, NULL, c.id_categorie, mq.id_marque
+        FROM {STAGING_TABLE} s
+        JOIN categorie c ON c.nom_categorie = s.categorie
+        LEFT JOIN marque mq ON mq.nom_marque = s.marque_dim
+        WHERE s.code_barre IS NULL
+        ON CONFLICT (nom_produit, (COALESCE(marque, '')), id_categorie) WHERE code_barres IS NULL
+        DO NOTHING;
+    """)
+    stats["produits"] += cur.rowcount
+
+    # produits déjà en base, créés avant la dimension marque
+    cur.execute(f"""
+        UPDATE produit p
+        SET id_marque = mq.id_marque
+        FROM {STAGING_TABLE} s
+        JOIN marque mq ON mq.nom_marque = s.marque_dim
+        WHERE p.id_marque IS NULL
+          AND p.code_barres = s.code_barre;
+    """)
+    cur.execute(f"""
+        UPDATE produit p
+        SET id_marque = mq.id_marque
+        FROM {STAGING_TABLE} s
+        JOIN categorie c ON c.nom_categorie = s.categorie
+        JOIN marque mq ON mq.nom_marque = s.marque_dim
+        WHERE p.id_marque IS NULL
+          AND s.code_barre IS NULL
+          AND p.code_barres IS NULL
+          AND p.nom_produit = s.produit
+          AND COALESCE(p.marque, '') = COALESCE(s.marque, '')
+          AND p.id_categorie = c.id_categorie;
+    """)
+
+    cur.execute(f"""
+        INSERT INTO observation_prix (id_produit, id_magasin, prix, source)
+        SELECT p.id_produit, m.id_magasin, s.prix_num, %(source)s
+        FROM {STAGING_TABLE} s
+        JOIN magasin m ON m.url_magasin = s.url_magasin
+        JOIN produit p ON p.code_barres = s.code_barre
+        WHERE s.code_barre IS NOT NULL
+        UNION ALL
+        SELECT p.id_produit, m.id_magasin, s.prix_num, %(source)s
+        FROM {STAGING_TABLE} s
+        JOIN categorie c ON c.nom_categorie = s.categorie
+        JOIN magasin m ON m.url_magasin = s.url_magasin
+        JOIN produit p ON p.nom_produit = s.produit
+                      AND COALESCE(p.marque, '') = COALESCE(s.marque, '')
+                      AND p.id_categorie = c.id_categorie
+                      AND p.code_barres IS NULL
+        WHERE s.code_barre IS NULL;
+    """, {"source": source})
+    stats["observations"] = cur.rowcount
+
+    return stats
+
+
+def import_csv_bulk(conn, csv_path, enseigne: str = "Carrefour", source: str = SOURCE) -> dict:
+    df = load_dataframe(csv_path)
+
+    with conn.cursor() as cur:
+        create_staging_table(cur)
+        copy_to_staging(cur, df)
+        after_id = last_observation_id(cur)
+        stats = resolve_staging(cur, enseigne, source)
+        stats["prix_courant"] = update_prix_courant(cur, after_id)
+        bump_data_version(cur)
 
     conn.commit()
+    return stats
 
 
 def main():
@@ -149,7 +372,11 @@ def main():
 
     with get_conn() as conn:
         print("✅ Connexion PostgreSQL OK")
-        import_csv(conn, csv_path)
+        if IMPORT_MODE == "bulk":
+            stats = import_csv_bulk(conn, csv_path)
+            print("   nouveaux :", ", ".join(f"{k}={v}" for k, v in stats.items()))
+        else:
+            import_csv(conn, csv_path)
 
     print("✅ Import terminé avec succès")
 
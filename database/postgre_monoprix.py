@@ -1,7 +1,7 @@
 # import_monoprix_csv_to_postgres.py
 # Import du dernier CSV Monoprix (scrapers/monoprix_premiere_necessite_*.csv) dans PostgreSQL
 # ✅ même logique que ton import Carrefour
-# ✅ sans ON CONFLICT
+# ✅ upserts ON CONFLICT (contraintes dans database/insert_data.sql)
 #
 # Dépendances:
 # pip install pandas psycopg2
@@ -10,6 +10,18 @@ import os
 import glob
 import pandas as pd
 import psycopg2
+from psycopg2.extras import execute_values
+
+try:
+    from database.dimensions import DimensionCache
+    from database.marques import marque_dimension
+    from database.prix_courant import last_observation_id, update_prix_courant
+    from database.version import bump_data_version
+except ImportError:  # lancé directement : python database/xxx.py
+    from dimensions import DimensionCache
+    from marques import marque_dimension
+    from prix_courant import last_observation_id, update_prix_courant
+    from version import bump_data_version
 
 PG_HOST = "localhost"
 PG_PORT = 5432
@@ -34,32 +46,38 @@ def get_conn():
     )
 
 
-# ---------- helpers sans ON CONFLICT ----------
+# ---------- helpers (upserts ON CONFLICT, voir database/insert_data.sql) ----------
+# DO UPDATE "à vide" plutôt que DO NOTHING : RETURNING renvoie aussi la ligne existante
 
-def get_or_create_categorie(cur, nom_categorie: str) -> int:
-    cur.execute("SELECT id_categorie FROM categorie WHERE nom_categorie = %s;", (nom_categorie,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
+def get_or_create_categorie(cur, nom_categorie: str, cache: DimensionCache = None) -> int:
+    if cache is not None:
+        # cache préchargé : 0 requête si connue, sinon INSERT ... RETURNING
+        cache.resolve_categories(cur, [nom_categorie])
+        return cache.get_categorie(nom_categorie)
 
     cur.execute(
-        "INSERT INTO categorie (nom_categorie) VALUES (%s) RETURNING id_categorie;",
+        """
+        INSERT INTO categorie (nom_categorie) VALUES (%s)
+        ON CONFLICT (nom_categorie) DO UPDATE SET nom_categorie = EXCLUDED.nom_categorie
+        RETURNING id_categorie;
+        """,
         (nom_categorie,)
     )
     return cur.fetchone()[0]
 
 
-def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str) -> int:
-    # on identifie un magasin par son url (logique)
-    cur.execute("SELECT id_magasin FROM magasin WHERE url_magasin = %s;", (url_magasin,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
+def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str,
+                          cache: DimensionCache = None) -> int:
+    if cache is not None:
+        cache.resolve_magasins(cur, [(nom_magasin, enseigne, url_magasin)])
+        return cache.get_magasin(url_magasin)
 
+    # on identifie un magasin par son url (logique)
     cur.execute(
         """
         INSERT INTO magasin (nom_magasin, enseigne, url_magasin)
         VALUES (%s, %s, %s)
+        ON CONFLICT (url_magasin) DO UPDATE SET url_magasin = EXCLUDED.url_magasin
         RETURNING id_magasin;
         """,
         (nom_magasin, enseigne, url_magasin)
@@ -67,58 +85,65 @@ def get_or_create_magasin(cur, nom_magasin: str, enseigne: str, url_magasin: str
     return cur.fetchone()[0]
 
 
-def get_or_create_produit(cur, nom_produit: str, marque: str, code_barre: str, id_categorie: int) -> int:
+def get_or_create_marque(cur, nom_marque: str) -> int:
+    cur.execute(
+        """
+        INSERT INTO marque (nom_marque) VALUES (%s)
+        ON CONFLICT (nom_marque) DO UPDATE SET nom_marque = EXCLUDED.nom_marque
+        RETURNING id_marque;
+        """,
+        (nom_marque,)
+    )
+    return cur.fetchone()[0]
+
+
+def get_or_create_produit(cur, nom_produit: str, marque: str, code_barre: str, id_categorie: int,
+                          cache: DimensionCache = None) -> int:
+    marque = marque or None
+    if cache is not None:
+        cache.resolve_produits(cur, [(nom_produit, marque, code_barre, id_categorie)])
+        return cache.get_produit(nom_produit, marque, code_barre, id_categorie)
+
+    # marque normalisée (table marque) : celle du CSV, sinon devinée depuis le nom
+    dim = marque_dimension(nom_produit, marque)
+    id_marque = get_or_create_marque(cur, dim) if dim else None
+
     # si code_barres existe -> meilleur identifiant
     if code_barre:
-        cur.execute("SELECT id_produit FROM produit WHERE code_barres = %s;", (code_barre,))
-        row = cur.fetchone()
-        if row:
-            return row[0]
-
         cur.execute(
             """
-            INSERT INTO produit (nom_produit, marque, code_barres, id_categorie)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (code_barres) DO UPDATE
+            SET marque = COALESCE(produit.marque, EXCLUDED.marque),
+                id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
             RETURNING id_produit;
             """,
-            (nom_produit, marque, code_barre, id_categorie)
+            (nom_produit, marque, code_barre, id_categorie, id_marque)
         )
         return cur.fetchone()[0]
 
-    # sinon fallback: nom + marque + categorie (code_barres NULL)
+    # sinon fallback: nom + marque + categorie (index unique partiel code_barres IS NULL)
     cur.execute(
         """
-        SELECT id_produit
-        FROM produit
-        WHERE nom_produit = %s
-          AND (marque IS NOT DISTINCT FROM %s)
-          AND id_categorie = %s
-          AND code_barres IS NULL;
-        """,
-        (nom_produit, marque, id_categorie)
-    )
-    row = cur.fetchone()
-    if row:
-        return row[0]
-
-    cur.execute(
-        """
-        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie)
-        VALUES (%s, %s, NULL, %s)
+        INSERT INTO produit (nom_produit, marque, code_barres, id_categorie, id_marque)
+        VALUES (%s, %s, NULL, %s, %s)
+        ON CONFLICT (nom_produit, (COALESCE(marque, '')), id_categorie) WHERE code_barres IS NULL
+        DO UPDATE SET id_marque = COALESCE(produit.id_marque, EXCLUDED.id_marque)
         RETURNING id_produit;
         """,
-        (nom_produit, marque, id_categorie)
+        (nom_produit, marque, id_categorie, id_marque)
     )
     return cur.fetchone()[0]
 
 
-def insert_observation(cur, id_produit: int, id_magasin: int, prix: float, source: str):
-    cur.execute(
-        """
-        INSERT INTO observation_prix (id_produit, id_magasin, prix, source)
-        VALUES (%s, %s, %s, %s);
-        """,
-        (id_produit, id_magasin, prix, source)
+def insert_observations(cur, observations):
+    # observations: liste de (id_produit, id_magasin, prix, source), envoyées par paquets
+    execute_values(
+        cur,
+        "INSERT INTO observation_prix (id_produit, id_magasin, prix, source) VALUES %s;",
+        observations,
+        page_size=1000,
     )
 
 
@@ -130,24 +155,37 @@ def import_csv(conn, csv_path: str):
     df["prix_num"] = pd.to_numeric(df.get("prix_num"), errors="coerce")
     df = df.dropna(subset=["produit", "categorie", "magasin", "url_magasin", "prix_num"])
 
-    with conn.cursor() as cur:
-        for _, r in df.iterrows():
-            produit = str(r["produit"]).strip()
-            categorie = str(r["categorie"]).strip()
-            magasin = str(r["magasin"]).strip()
-            url_magasin = str(r["url_magasin"]).strip()
-
-            # Monoprix n'a pas marque/code_barre dans ton CSV -> on met None
-            marque = None
-            code_barre = None
-
-            prix = float(r["prix_num"])
+    records = []
+    for _, r in df.iterrows():
+        produit = str(r["produit"]).strip()
+        categorie = str(r["categorie"]).strip()
+        magasin = str(r["magasin"]).strip()
+        url_magasin = str(r["url_magasin"]).strip()
 
-            id_cat = get_or_create_categorie(cur, categorie)
-            id_mag = get_or_create_magasin(cur, magasin, "Monoprix", url_magasin)
-            id_prod = get_or_create_produit(cur, produit, marque, code_barre, id_cat)
+        prix = float(r["prix_num"])
+        records.append((produit, categorie, magasin, url_magasin, prix))
 
-            insert_observation(cur, id_prod, id_mag, prix, source="monoprix_scrape")
+    with conn.cursor() as cur:
+        # ids chargés une fois, absents créés en lot -> la boucle ne touche plus la base
+        cache = DimensionCache.load(cur)
+        cache.resolve_categories(cur, (r[1] for r in records))
+        cache.resolve_magasins(cur, ((r[2], "Monoprix", r[3]) for r in records))
+        # Monoprix n'a pas marque/code_barre dans ton CSV -> on met None
+        # (la marque normalisée, id_marque, est devinée depuis le nom par DimensionCache)
+        cache.resolve_produits(cur, ((r[0], None, None, cache.get_categorie(r[1])) for r in records))
+
+        observations = []
+        for produit, categorie, magasin, url_magasin, prix in records:
+            id_cat = get_or_create_categorie(cur, categorie, cache)
+            id_mag = get_or_create_magasin(cur, magasin, "Monoprix", url_magasin, cache)
+            id_prod = get_or_create_produit(cur, produit, None, None, id_cat, cache)
+            observations.append((id_prod, id_mag, prix, "monoprix_scrape"))
+
+        after_id = last_observation_id(cur)
+        insert_observations(cur, observations)
+        update_prix_courant(cur, after_id)
+        # invalide les caches de l'app (listes déroulantes, etc.)
+        bump_data_version(cur)
 
     conn.commit()
 
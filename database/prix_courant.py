@@ -0,0 +1,33 @@
+# prix_courant.py
+# Table prix_courant : dernier prix connu par (produit, magasin).
+# ✅ mise à jour incrémentale par les importers (seulement les observations qu'ils viennent d'ajouter)
+# -> l'app lit O(produits) lignes, quel que soit le volume de observation_prix
+
+
+def last_observation_id(cur) -> int:
+    # à lire AVANT d'insérer : toutes les observations de l'import auront un id plus grand
+    cur.execute("SELECT COALESCE(MAX(id_observation), 0) FROM observation_prix;")
+    return cur.fetchone()[0]
+
+
+def update_prix_courant(cur, after_id: int) -> int:
+    # DISTINCT ON : si un produit apparaît plusieurs fois dans l'import, la dernière ligne gagne
+    # WHERE du DO UPDATE : un import plus ancien ne doit pas écraser un prix plus récent
+    cur.execute(
+        """
+        INSERT INTO prix_courant (id_produit, id_magasin, prix, observed_at, id_observation)
+        SELECT DISTINCT ON (op.id_produit, op.id_magasin)
+               op.id_produit, op.id_magasin, op.prix, op.observed_at, op.id_observation
+        FROM observation_prix op
+        WHERE op.id_observation > %s
+        ORDER BY op.id_produit, op.id_magasin, op.observed_at DESC, op.id_observation DESC
+        ON CONFLICT (id_produit, id_magasin) DO UPDATE
+        SET prix = EXCLUDED.prix,
+            observed_at = EXCLUDED.observed_at,
+            id_observation = EXCLUDED.id_observation
+        WHERE (prix_courant.observed_at, prix_courant.id_observation)
+              <= (EXCLUDED.observed_at, EXCLUDED.id_observation);
+        """,
+        (after_id,)
+    )
+    return cur.rowcount
@@ -0,0 +1,66 @@
+# recherche.py
+# Recherche de produits par nom pour l'app (filtre "nom" et tri "pertinence").
+# ✅ pg_trgm : sous-chaîne et fautes de frappe, via index GIN (voir database/recherche.sql)
+# ✅ unaccent + tsvector 'french' : "pates" trouve "Pâtes", "oeufs" trouve "Œufs"
+# ✅ migration absente -> on retombe sur l'ancien ILIKE '%...%'
+
+import threading
+
+_backend = None
+_lock = threading.Lock()
+
+
+def search_backend(cur) -> str:
+    # détecté une fois par processus : "trgm" si la migration est passée, sinon "ilike"
+    global _backend
+    if _backend is None:
+        cur.execute("""
+            SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL
+               AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') AS ok;
+        """)
+        row = cur.fetchone()
+        ok = row["ok"] if isinstance(row, dict) else row[0]
+        with _lock:
+            _backend = "trgm" if ok else "ilike"
+    return _backend
+
+
+def reset_search_backend():
+    # à appeler après avoir joué recherche.sql sans redémarrer l'app
+    global _backend
+    with _lock:
+        _backend = None
+
+
+def like_pattern(txt: str) -> str:
+    # % et _ saisis par l'utilisateur sont des caractères normaux, pas des jokers
+    txt = txt.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{txt}%"
+
+
+def search_filter(cur, nom: str, col: str = "p.nom_produit"):
+    # -> (fragment SQL " AND ...", paramètres)
+    if search_backend(cur) == "ilike":
+        return f" AND {col} ILIKE %s", [like_pattern(nom)]
+
+    # %%> : opérateur pg_trgm "%>" (similarité avec un mot du nom), échappé pour psycopg2
+    sql = f"""
+     AND (f_unaccent({col}) LIKE f_unaccent(%s)
+          OR to_tsvector('french', f_unaccent({col})) @@ plainto_tsquery('french', f_unaccent(%s))
+          OR f_unaccent({col}) %%> f_unaccent(%s))"""
+    return sql, [like_pattern(nom), nom, nom]
+
+
+def search_rank(cur, nom: str, col: str = "p.nom_produit"):
+    # -> (expression SQL de pertinence, plus grand = meilleur, paramètres)
+    if search_backend(cur) == "ilike":
+        # sans extensions : les noms qui commencent par la saisie d'abord
+        return f"(CASE WHEN {col} ILIKE %s THEN 1 ELSE 0 END)", [like_pattern(nom)[1:]]
+
+    # ::float8 : ts_rank / word_similarity sont des real ; la valeur lue (float Python) doit
+    # se comparer exactement à elle-même dans le curseur (real élargi en float8 != float Python)
+    sql = f"""GREATEST(
+        ts_rank(to_tsvector('french', f_unaccent({col})), plainto_tsquery('french', f_unaccent(%s))),
+        word_similarity(f_unaccent(%s), f_unaccent({col}))
+    )::float8"""
+    return sql, [nom, nom]
@@ -0,0 +1,26 @@
+-- recherche.sql
+-- Migration : recherche de produits par nom (sous-chaîne, fautes de frappe, accents)
+-- ✅ à jouer après insert_data.sql : psql -d "SAE5.6" -f database/recherche.sql
+-- ✅ rejouable (IF NOT EXISTS / OR REPLACE)
+--
+-- Nécessite les extensions contrib pg_trgm et unaccent (paquet postgresql-contrib).
+-- Sans cette migration, l'app retombe sur l'ancien filtre ILIKE (voir database/recherche.py).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() n'est pas IMMUTABLE (dépend du search_path) : impossible de l'indexer telle quelle
+-- "Pâtes" -> "pates", "Œufs" -> "oeufs"
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, lower($1)) $$;
+
+-- sous-chaîne (LIKE '%...%') et similarité (%>) : index trigrammes
+CREATE INDEX IF NOT EXISTS produit_nom_trgm_idx
+    ON produit USING gin (f_unaccent(nom_produit) gin_trgm_ops);
+
+-- mots entiers avec racinisation française ("pâte" trouve "Pâtes") + classement ts_rank
+CREATE INDEX IF NOT EXISTS produit_nom_fts_idx
+    ON produit USING gin (to_tsvector('french', f_unaccent(nom_produit)));
+
+ANALYZE produit;
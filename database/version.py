@@ -0,0 +1,56 @@
+# version.py
+# Version des données : compteur incrémenté par les importers à chaque import terminé.
+# ✅ l'app s'en sert pour savoir quand ses caches sont périmés
+# ✅ lue au plus toutes les `check_interval` secondes (pas une requête par page vue)
+
+import threading
+import time
+
+
+def bump_data_version(cur) -> int:
+    # à appeler dans la transaction de l'import, juste avant le COMMIT
+    # upsert : la ligne id = 1 est recréée si elle manque (base initialisée avant data_version)
+    cur.execute("""
+        INSERT INTO data_version (id, version, updated_at) VALUES (1, 1, now())
+        ON CONFLICT (id) DO UPDATE
+        SET version = data_version.version + 1, updated_at = now()
+        RETURNING version;
+    """)
+    return cur.fetchone()[0]
+
+
+def read_data_version(cur):
+    cur.execute("SELECT version, updated_at FROM data_version WHERE id = 1;")
+    row = cur.fetchone()
+    if row is None:
+        return 0, None
+    if isinstance(row, dict):
+        return row["version"], row["updated_at"]
+    return row[0], row[1]
+
+
+class VersionWatcher:
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self.version = None
+        self.updated_at = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_fresh(self):
+        # True si la valeur en mémoire peut servir sans relire la base
+        return self.version is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    def current(self, cur):
+        now = time.monotonic()
+        if not self.is_fresh():
+            version, updated_at = read_data_version(cur)
+            with self._lock:
+                self.version, self.updated_at = version, updated_at
+                self._checked_at = now
+        return self.version
+
+    def expire(self):
+        # force une relecture au prochain appel (invalidation explicite)
+        with self._lock:
+            self._checked_at = 0.0
@@ -0,0 +1,109 @@
+# export.py
+# Export des résultats (CSV, Parquet) envoyé au fil de l'eau.
+# ✅ entrée = paquets de lignes lus sur un curseur serveur : mémoire constante côté worker
+# ✅ CSV : un morceau de texte par paquet
+# ✅ Parquet (optionnel, pip install pyarrow) : un row group par paquet, octets envoyés dès l'écriture
+
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet indisponible, le CSV fonctionne sans
+    pa = pq = None
+
+# OID PostgreSQL -> type Arrow (le reste part en texte)
+_ARROW_TYPES = {
+    16: "bool",
+    20: "int64", 21: "int64", 23: "int64",
+    700: "float64", 701: "float64", 1700: "float64",
+    1082: "date",
+    1114: "timestamp", 1184: "timestamptz",
+}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def csv_chunks(columns, batches):
+    # columns : noms ; batches : itérable de listes de tuples
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def arrow_schema(columns, type_codes):
+    fields = []
+    for name, oid in zip(columns, type_codes):
+        kind = _ARROW_TYPES.get(oid)
+        if kind == "bool":
+            t = pa.bool_()
+        elif kind == "int64":
+            t = pa.int64()
+        elif kind == "float64":
+            t = pa.float64()
+        elif kind == "date":
+            t = pa.date32()
+        elif kind == "timestamp":
+            t = pa.timestamp("us")
+        elif kind == "timestamptz":
+            t = pa.timestamp("us", tz="UTC")
+        else:
+            t = pa.string()
+        fields.append(pa.field(name, t))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    # fichier "en écriture seule" : les octets écrits par ParquetWriter sont repris à chaque paquet
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def parquet_chunks(columns, type_codes, batches):
+    schema = arrow_schema(columns, type_codes)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in batches:
+            cols = list(zip(*rows)) if rows else [[] for _ in columns]
+            arrays = []
+            for values, field in zip(cols, schema):
+                if pa.types.is_floating(field.type):
+                    values = [None if v is None else float(v) for v in values]   # NUMERIC -> float
+                elif pa.types.is_string(field.type):
+                    values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
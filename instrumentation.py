@@ -0,0 +1,203 @@
+# instrumentation.py
+# Mesures par requête pour l'app Flask.
+# ✅ durée de chaque phase : connexion (sortie du pool), chaque cur.execute, vue, rendu streamé
+# ✅ en-tête Server-Timing (visible dans l'onglet Réseau du navigateur)
+# ✅ /metrics au format texte Prometheus
+# ✅ log des requêtes SQL lentes avec leurs paramètres
+
+import logging
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from psycopg2.extensions import cursor as _BaseCursor
+from psycopg2.extras import RealDictCursor
+
+log = logging.getLogger("sae56.sql")
+
+SLOW_QUERY_MS = 200.0
+# bornes (secondes) de l'histogramme des durées de requêtes HTTP
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# =========================
+# MESURES D'UNE REQUÊTE HTTP
+# =========================
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []   # (nom, ms, description)
+
+    def add(self, name, ms, desc=""):
+        self.phases.append((name, ms, desc))
+
+    def server_timing(self):
+        parts = []
+        nb_sql = 0
+        for name, ms, desc in self.phases:
+            if name == "sql":
+                nb_sql += 1
+                name = f"sql-{nb_sql}"
+            entry = f"{name};dur={ms:.2f}"
+            if desc:
+                entry += f';desc="{desc}"'
+            parts.append(entry)
+        return ", ".join(parts)
+
+
+def current_timings():
+    return g.get("timings") if has_request_context() else None
+
+
+def record(name, ms, desc=""):
+    t = current_timings()
+    if t is not None:
+        t.add(name, ms, desc)
+    metrics.observe_phase(name, ms)
+
+
+def short_sql(query) -> str:
+    # description compacte pour Server-Timing (pas de guillemets, une seule ligne)
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    txt = re.sub(r"\s+", " ", str(query)).strip()
+    return txt[:60].replace('"', "'")
+
+
+# =========================
+# CURSEURS CHRONOMÉTRÉS
+# =========================
+
+class TimingCursorMixin:
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            record("sql", ms, short_sql(query))
+            if ms >= SLOW_QUERY_MS:
+                metrics.inc_slow()
+                log.warning("requête lente (%.1f ms) : %s | paramètres=%r",
+                            ms, re.sub(r"\s+", " ", str(query)).strip(), vars)
+
+
+class TimedCursor(TimingCursorMixin, _BaseCursor):
+    pass
+
+
+class TimedDictCursor(TimingCursorMixin, RealDictCursor):
+    pass
+
+
+# =========================
+# MÉTRIQUES DU PROCESSUS (Prometheus)
+# =========================
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}       # (endpoint, status) -> nb
+        self.durations = {}      # endpoint -> [compteurs par borne..., somme, nb]
+        self.phases = {}         # phase -> [somme ms, nb]
+        self.slow_queries = 0
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            key = (endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            h = self.durations.setdefault(endpoint, [0] * len(BUCKETS) + [0.0, 0])
+            for i, b in enumerate(BUCKETS):
+                if seconds <= b:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+
+    def observe_phase(self, phase, ms):
+        with self._lock:
+            p = self.phases.setdefault(phase, [0.0, 0])
+            p[0] += ms
+            p[1] += 1
+
+    def inc_slow(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self, gauges=None, counters=None) -> str:
+        # gauges / counters : valeurs tenues ailleurs (pool, cache), {nom: (aide, valeur)} ;
+        # counters = compteurs cumulés depuis le démarrage, nommés *_total
+        out = []
+        with self._lock:
+            out.append("# HELP app_requests_total Requêtes HTTP traitées.")
+            out.append("# TYPE app_requests_total counter")
+            for (endpoint, status), n in sorted(self.requests.items()):
+                out.append(f'app_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+
+            out.append("# HELP app_request_duration_seconds Durée totale des requêtes HTTP (rendu streamé compris).")
+            out.append("# TYPE app_request_duration_seconds histogram")
+            for endpoint, h in sorted(self.durations.items()):
+                for b, n in zip(BUCKETS, h):
+                    out.append(f'app_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{b}"}} {n}')
+                out.append(f'app_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {h[-1]}')
+                out.append(f'app_request_duration_seconds_sum{{endpoint="{endpoint}"}} {h[-2]:.6f}')
+                out.append(f'app_request_duration_seconds_count{{endpoint="{endpoint}"}} {h[-1]}')
+
+            out.append("# HELP app_phase_duration_seconds Temps passé par phase (connect, sql, view, render).")
+            out.append("# TYPE app_phase_duration_seconds summary")
+            for phase, (total_ms, n) in sorted(self.phases.items()):
+                out.append(f'app_phase_duration_seconds_sum{{phase="{phase}"}} {total_ms / 1000:.6f}')
+                out.append(f'app_phase_duration_seconds_count{{phase="{phase}"}} {n}')
+
+            out.append("# HELP app_slow_queries_total Requêtes SQL au-dessus du seuil de lenteur.")
+            out.append("# TYPE app_slow_queries_total counter")
+            out.append(f"app_slow_queries_total {self.slow_queries}")
+
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name, (help_txt, value) in sorted((values or {}).items()):
+                out.append(f"# HELP {name} {help_txt}")
+                out.append(f"# TYPE {name} {kind}")
+                out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+
+# =========================
+# BRANCHEMENT SUR FLASK
+# =========================
+
+def instrument_app(app, slow_query_ms=None):
+    global SLOW_QUERY_MS
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = slow_query_ms
+
+    @app.before_request
+    def _start_timings():
+        g.timings = RequestTimings()
+
+    @app.after_request
+    def _finish_timings(resp):
+        timings = g.get("timings")
+        if timings is None:
+            return resp
+
+        view_ms = (time.perf_counter() - timings.start) * 1000
+        record("view", view_ms)
+        resp.headers["Server-Timing"] = timings.server_timing()
+
+        endpoint = request.endpoint or "inconnu"
+        status = resp.status_code
+        rendered_at = time.perf_counter()
+
+        # réponse streamée : le rendu (et ses requêtes SQL) continue après l'envoi des en-têtes
+        def _on_close():
+            now = time.perf_counter()
+            if resp.is_streamed:
+                metrics.observe_phase("render", (now - rendered_at) * 1000)
+            metrics.observe_request(endpoint, status, now - timings.start)
+
+        resp.call_on_close(_on_close)
+        return resp
@@ -0,0 +1,150 @@
+# response_cache.py
+# Cache de pages complètes pour app.home, clé = filtres normalisés.
+# ✅ LRU borné (nombre d'entrées + taille totale)
+# ✅ invalidé par la version des données (table data_version, incrémentée par les importers)
+# ✅ backend "memoire" (par processus) ou "fichier" (partagé entre workers d'une même machine)
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+
+def make_key(filters: dict) -> str:
+    # filtres déjà validés / complétés par parse_filters : ordre des paramètres et vides ignorés
+    # urlencode échappe & et = dans les valeurs : deux jeux de filtres différents -> deux clés
+    return urlencode(sorted((k, v) for k, v in filters.items() if v))
+
+
+class MemoryResponseCache:
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> bytes
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _check_version(self, version):
+        # nouvelle version des données : tout le contenu est périmé
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            body = self._entries.get(key)
+            if body is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+
+    def put(self, key, version, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+
+class FileResponseCache:
+    # un fichier par entrée : <version>-<sha1(clé)>.html ; l'accès (mtime) sert d'ordre LRU
+    def __init__(self, directory, max_entries=2048):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key, version):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{version}-{digest}.html")
+
+    def get(self, key, version):
+        path = self._path(key, version)
+        try:
+            with open(path, "rb") as fh:
+                body = fh.read()
+            os.utime(path)
+        except OSError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return body
+
+    def put(self, key, version, body: bytes):
+        # écriture atomique : un autre worker ne lit jamais un fichier à moitié écrit
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(body)
+        os.replace(tmp, self._path(key, version))
+        self._evict(version)
+
+    def _evict(self, version):
+        prefix = f"{version}-"
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        current = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".html"):
+                continue
+            if not name.startswith(prefix):
+                self._remove(path)   # ancienne version des données
+                continue
+            try:
+                current.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+
+        if len(current) > self.max_entries:
+            current.sort()
+            for _, path in current[: len(current) - self.max_entries]:
+                self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self._count("evictions")
+        except OSError:
+            pass
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".html"):
+                self._remove(os.path.join(self.directory, name))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
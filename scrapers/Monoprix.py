@@ -8,11 +8,6 @@
 
 from __future__ import annotations
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -25,6 +20,10 @@ import re
 from pathlib import Path
 from datetime import datetime
 
+# driver partagé + attentes événementielles (même dossier)
+from browser import make_driver
+from waits import count_elements, site_timeout, wait_for_count_change, wait_dom_settled
+
 
 # =========================
 # CONFIGURATION
@@ -35,6 +34,16 @@ DEBUG = True
 
 MAGASIN_NOM = "Monoprix Courses (online)"
 MAGASIN_URL = BASE_URL
+PRODUCT_SELECTOR = 'a[data-test="fop-product-link"][href]'
+
+# ✅ timeouts adaptatifs (s) : (initial, plancher, plafond), appris sur les latences observées
+SITE = "monoprix"
+SCROLL_TIMEOUT = (1.5, 0.5, 4.0)
+DOM_SETTLE_TIMEOUT = 3
+SCROLL_STABLE_ROUNDS = 3
+# ✅ politesse : pause entre deux grosses pages (même hôte, enchaînées sans autre délai) ;
+# pas une attente de rendu, chaque page attend déjà réseau + DOM avant l'extraction
+POLITE_DELAY_S = (0.8, 1.4)
 
 # Grosses catégories Monoprix (tes URLs)
 MONOPRIX_TOP_PAGES = {
@@ -99,19 +108,8 @@ OUTPUT_FILE = SCRIPT_DIR / f"monoprix_premiere_necessite_{datetime.now().strftim
 # =========================
 
 def configure_selenium():
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-    )
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.set_page_load_timeout(60)
-    return driver
+    # images / polices / trackers bloqués via CDP (browser.py)
+    return make_driver(SITE)
 
 
 # =========================
@@ -178,7 +176,7 @@ def accept_cookies(driver):
         try:
             btn = WebDriverWait(driver, 2).until(EC.element_to_be_clickable((By.XPATH, xp)))
             driver.execute_script("arguments[0].click();", btn)
-            time.sleep(0.8)
+            wait_dom_settled(driver, timeout=DOM_SETTLE_TIMEOUT)
             if DEBUG:
                 print("    [POPUP] cookies acceptés")
             return
@@ -191,9 +189,9 @@ def accept_cookies(driver):
 # =========================
 
 def count_visible_products(driver) -> int:
-    return len(driver.find_elements(By.CSS_SELECTOR, 'a[data-test="fop-product-link"][href]'))
+    return count_elements(driver, PRODUCT_SELECTOR)
 
-def scroll_to_stabilize(driver, max_rounds=30, pause=0.75):
+def scroll_to_stabilize(driver, max_rounds=30):
     last = count_visible_products(driver)
     stable = 0
 
@@ -202,11 +200,14 @@ def scroll_to_stabilize(driver, max_rounds=30, pause=0.75):
 
     for i in range(max_rounds):
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(pause + random.uniform(0.12, 0.35))
-
-        cur = count_visible_products(driver)
+        # rend la main dès que les nouvelles cartes sont rendues, sinon après le timeout appris
+        cur, latency = wait_for_count_change(
+            driver, PRODUCT_SELECTOR, last, adaptive=site_timeout(SITE, "scroll", *SCROLL_TIMEOUT),
+            confirm=stable == SCROLL_STABLE_ROUNDS - 1,
+        )
         if DEBUG:
-            print(f"    [SCROLL] tour {i+1}: {cur} produits visibles")
+            attente = f"{latency:.2f}s" if latency is not None else "timeout"
+            print(f"    [SCROLL] tour {i+1}: {cur} produits visibles ({attente})")
 
         if cur <= last:
             stable += 1
@@ -214,7 +215,7 @@ def scroll_to_stabilize(driver, max_rounds=30, pause=0.75):
             stable = 0
 
         last = cur
-        if stable >= 3:
+        if stable >= SCROLL_STABLE_ROUNDS:
             break
 
 
@@ -287,9 +288,9 @@ def scrape_top_page(driver, page_label: str, page_url: str):
     accept_cookies(driver)
 
     WebDriverWait(driver, 25).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, 'a[data-test="fop-product-link"][href]'))
+        EC.presence_of_element_located((By.CSS_SELECTOR, PRODUCT_SELECTOR))
     )
-    time.sleep(random.uniform(0.8, 1.3))
+    wait_dom_settled(driver, timeout=DOM_SETTLE_TIMEOUT)
 
     scroll_to_stabilize(driver, max_rounds=30)
 
@@ -311,7 +312,7 @@ if __name__ == "__main__":
     try:
         for page_label, page_url in MONOPRIX_TOP_PAGES.items():
             all_rows.extend(scrape_top_page(driver, page_label, page_url))
-            time.sleep(random.uniform(0.8, 1.4))
+            time.sleep(random.uniform(*POLITE_DELAY_S))
     finally:
         driver.quit()
 
@@ -0,0 +1,74 @@
+# bench_count_products.py
+# Benchmark : comptage des cartes produit (ancien find_elements vs querySelectorAll en un appel JS).
+# ✅ page fixture générée localement (cartes au format Carrefour), aucun accès réseau
+# ✅ même driver que les scrapers (browser.make_driver), blocage CDP désactivé (page locale)
+#
+# Usage :
+#   python scrapers/bench_count_products.py
+
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from selenium.webdriver.common.by import By
+
+# driver partagé + sondes (même dossier)
+from browser import make_driver
+from waits import count_elements, probe_progress
+
+BENCH_CARDS = [200, 1000, 2000, 4000]
+BENCH_REPEAT = 15
+PRODUCT_SELECTOR = "a.product-card-click-wrapper[href]"
+
+CARD_TEMPLATE = """\
+<div class="product-list-card-plp-grid-new">
+  <article>
+    <a class="product-card-click-wrapper" href="/p/produit-test-{i}-{ean}">
+      <h3 class="product-card-title__text">Produit test {i} MARQUE</h3>
+    </a>
+    <div data-testid="product-price__amount--main"><p>{euros}</p><p>,{cents}</p><p>€</p></div>
+  </article>
+</div>
+"""
+
+
+def write_fixture(n, directory) -> Path:
+    cards = "".join(
+        CARD_TEMPLATE.format(i=i, ean=3560070000000 + i, euros=1 + i % 9, cents=f"{i % 100:02d}")
+        for i in range(n)
+    )
+    path = Path(directory) / f"fixture_{n}.html"
+    path.write_text(f"<!doctype html><html><body>{cards}</body></html>", encoding="utf-8")
+    return path
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return result, statistics.median(samples), max(samples)
+
+
+if __name__ == "__main__":
+    driver = make_driver(block_resources=False)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'cartes':>7} | {'find_elements (ms)':>20} | {'querySelectorAll (ms)':>22} | {'sonde (ms)':>12} | gain")
+            for n in BENCH_CARDS:
+                driver.get(write_fixture(n, tmp).as_uri())
+
+                old_n, old_med, old_max = timed(
+                    lambda: len(driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)), BENCH_REPEAT
+                )
+                new_n, new_med, new_max = timed(lambda: count_elements(driver, PRODUCT_SELECTOR), BENCH_REPEAT)
+                _, probe_med, _ = timed(lambda: probe_progress(driver, PRODUCT_SELECTOR), BENCH_REPEAT)
+
+                assert old_n == new_n == n, (old_n, new_n, n)
+                print(f"{n:>7} | {old_med:>9.1f} (max {old_max:>6.1f}) | {new_med:>10.1f} (max {new_max:>6.1f}) "
+                      f"| {probe_med:>12.1f} | x{old_med / max(new_med, 1e-6):.0f}")
+    finally:
+        driver.quit()
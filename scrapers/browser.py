@@ -0,0 +1,92 @@
+# browser.py
+# Fabrique de driver Chrome commune aux scrapers (carrefour.py, Monoprix.py, magasin_scraper.py).
+# ✅ mêmes options partout (headless, user-agent, log "performance" pour waits.wait_network_idle)
+# ✅ blocage CDP (Network.setBlockedURLs) : images, médias, polices, domaines de tracking
+# ✅ liste blanche par site : catégories ou motifs à laisser passer
+#
+# Dépendances:
+# pip install selenium webdriver-manager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+PAGE_LOAD_TIMEOUT = 60
+
+# motifs Network.setBlockedURLs ('*' = joker), par catégorie ; un motif couvre toute l'URL :
+# "*.png" ne bloque pas "logo.png?v=3" -> blocked_patterns ajoute la variante "*.png?*"
+BLOCKED_RESOURCES = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.m3u8"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*googlesyndication.com*", "*googleadservices.com*", "*facebook.net*",
+        "*connect.facebook.*", "*hotjar.com*", "*criteo.com*", "*criteo.net*",
+        "*contentsquare.net*", "*abtasty.com*", "*scorecardresearch.com*",
+        "*bat.bing.com*", "*analytics.tiktok.com*", "*ct.pinterest.com*", "*sc-static.net*",
+        "*kameleoon.*", "*tealium*", "*quantummetric.com*", "*dynatrace.com*",
+    ],
+}
+
+# ✅ liste blanche par site : nom de catégorie (ex "fonts") ou motif exact de BLOCKED_RESOURCES
+# (à compléter si un site casse : bouton introuvable, contenu absent...)
+SITE_ALLOWLIST = {
+    "carrefour": [],
+    "monoprix": [],
+    "magasins": [],
+}
+
+
+def blocked_patterns(site=None):
+    allow = set(SITE_ALLOWLIST.get(site, []))
+    patterns = []
+    for category, motifs in BLOCKED_RESOURCES.items():
+        if category in allow:
+            continue
+        for m in motifs:
+            if m in allow:
+                continue
+            patterns.append(m)
+            if m.startswith("*."):
+                patterns.append(m + "?*")   # même extension suivie d'une query string
+    return patterns
+
+
+def make_driver(site=None, block_resources=True):
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    # événements réseau CDP pour waits.wait_network_idle
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    # le réglage Chrome coupe TOUTES les images : seulement si le site n'en autorise aucune
+    allow = set(SITE_ALLOWLIST.get(site, []))
+    images_allowed = "images" in allow or any(m in allow for m in BLOCKED_RESOURCES["images"])
+    if block_resources and not images_allowed:
+        # en plus des motifs : images servies sans extension (CDN avec paramètres)
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    driver = webdriver.Chrome(
+        service=Service(ChromeDriverManager().install()),
+        options=options
+    )
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+
+    if block_resources:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_patterns(site)})
+        except Exception as e:
+            # pas bloquant : le scraping fonctionne, seulement plus lentement
+            print(f"[WARN] blocage CDP indisponible : {e}")
+    return driver
@@ -2,14 +2,11 @@
 # Scrape Carrefour: magasin -> catégories (ta liste "première nécessité") -> bouton "Produits suivants"
 # + extraction prix + marque + code_barre (EAN depuis URL) + dédup + export CSV
 # + option: 1 fichier .py par produit
+# + mode parallèle : N workers (1 process = 1 Chrome) alimentés par une file de jobs (magasin, catégorie)
 
 # Dépendances:
 # pip install selenium webdriver-manager beautifulsoup4 pandas
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+# (driver Chrome partagé : browser.py, même dossier)
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -20,9 +17,26 @@ import pandas as pd
 import time
 import random
 import re
+import sys
+import queue
+import multiprocessing as mp
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from pathlib import Path
 from datetime import datetime
 
+# même heuristique de marque que les importers (database/marques.py)
+try:
+    from database.marques import guess_marque_from_name
+except ImportError:  # lancé directement : python scrapers/carrefour.py
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from database.marques import guess_marque_from_name
+
+# driver partagé + attentes événementielles (même dossier)
+from browser import make_driver
+from waits import (count_elements, probe_progress, site_timeout, wait_for_count_change,
+                   wait_dom_settled, wait_network_idle)
+
 
 # =========================
 # CONFIGURATION
@@ -59,8 +73,29 @@ CATEGORIES = {
 DEBUG = True
 MAX_STORES = 1
 MAX_LOAD_MORE_CLICKS = 40
-SCROLL_PAUSE = 0.9
 SCROLL_MAX_ROUNDS = 20
+PRODUCT_SELECTOR = "a.product-card-click-wrapper[href]"
+
+# ✅ timeouts adaptatifs (s) : (initial, plancher, plafond), appris sur les latences observées
+SITE = "carrefour"
+SCROLL_TIMEOUT = (1.5, 0.5, 4.0)        # nouvelles cartes après un scroll
+LOAD_MORE_TIMEOUT = (25.0, 5.0, 25.0)   # nouvelles cartes après "Produits suivants"
+BUTTON_TIMEOUT = (6.0, 2.0, 6.0)        # apparition du bouton "Produits suivants"
+PAGE_IDLE_TIMEOUT = 30
+DOM_SETTLE_TIMEOUT = 3                  # plafond d'attente "DOM stable" (carrousels animés)
+SCROLL_STABLE_ROUNDS = 3                # tours sans nouvelle carte avant d'arrêter le scroll
+
+# ✅ extraction incrémentale : après chaque "Produits suivants", seules les nouvelles cartes sont lues (1 appel JS)
+# retirer du DOM les cartes déjà lues allège Chrome, mais peut gêner le rendu React de certaines pages -> off par défaut
+PRUNE_CAPTURED_CARDS = False
+
+# ✅ Mode parallèle : 1 = séquentiel (un seul Chrome), N > 1 = N process worker
+PARALLEL_WORKERS = 1
+# ✅ politesse : nombre max de requêtes en cours sur un même hôte, tous workers confondus
+# (créneau pris seulement le temps d'un chargement de page / scroll / "Produits suivants", pas du job entier)
+MAX_PER_HOST = 2
+# job sans nouvelle d'aucun worker pendant ce délai -> on considère le pool bloqué
+WORKER_RESULT_TIMEOUT = 15 * 60
 
 # ✅ Option: créer 1 fichier python par produit
 WRITE_ONE_FILE_PER_PRODUCT = True
@@ -78,23 +113,53 @@ PRODUCT_CODE_DIR.mkdir(parents=True, exist_ok=True)
 # =========================
 
 def configure_selenium():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--window-size=1920,1080")
-
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-    )
+    # images / polices / trackers bloqués via CDP (browser.py)
+    return make_driver(SITE)
+
+
+def scroll_timeout():
+    return site_timeout(SITE, "scroll", *SCROLL_TIMEOUT)
+
+
+def load_more_timeout():
+    return site_timeout(SITE, "load_more", *LOAD_MORE_TIMEOUT)
+
+
+def button_timeout():
+    return site_timeout(SITE, "button", *BUTTON_TIMEOUT)
 
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
-    driver.set_page_load_timeout(60)
-    return driver
+
+# =========================
+# POLITESSE PAR HÔTE (MODE PARALLÈLE)
+# =========================
+
+# renseignés dans chaque process worker par scrape_worker ; vides en mode séquentiel
+_host_slots = {}     # hôte -> BoundedSemaphore partagé entre workers
+_host_index = {}     # hôte -> indice (pour _slot_held)
+_slot_held = None    # mp.Array : indice de l'hôte dont le worker tient un créneau, -1 sinon
+_worker_id = None
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc
+
+
+@contextmanager
+def host_slot(url):
+    # une requête en cours de plus sur cet hôte le temps du bloc (no-op en mode séquentiel)
+    host = host_of(url)
+    slot = _host_slots.get(host)
+    if slot is None:
+        yield
+        return
+    slot.acquire()
+    # noté dans la mémoire partagée : si ce process meurt ici, le parent rend le créneau
+    _slot_held[_worker_id] = _host_index[host]
+    try:
+        yield
+    finally:
+        _slot_held[_worker_id] = -1
+        slot.release()
 
 
 # =========================
@@ -123,51 +188,6 @@ def extract_code_barre_from_url(url_produit: str):
     return m.group(1) if m else None
 
 
-def guess_marque_from_name(nom_produit: str):
-    if not nom_produit or nom_produit == "N/A":
-        return None
-
-    s = nom_produit.replace("\u00a0", " ").strip()
-    tokens = [t for t in s.split(" ") if t]
-
-    tail = []
-    for t in reversed(tokens):
-        letters = re.sub(r"[^A-Za-zÀ-ÖØ-öø-ÿ]", "", t)
-        if letters and letters.upper() == letters:
-            tail.append(t)
-            if len(tail) >= 3:
-                break
-        else:
-            break
-
-    if not tail:
-        return None
-
-    tail = list(reversed(tail))
-    marque = " ".join(tail).strip(" ,;-")
-    return marque if marque else None
-
-
-def extract_price_from_full_card(card):
-    main = card.select_one('[data-testid="product-price__amount--main"]')
-    if main:
-        parts = [p.get_text(strip=True) for p in main.select("p") if p.get_text(strip=True)]
-        if parts:
-            txt = " ".join(parts).replace("  ", " ").strip().replace(" ,", ",")
-            return txt
-
-    any_price = card.select_one('[data-testid^="product-price__amount"]')
-    if any_price:
-        parts = [p.get_text(strip=True) for p in any_price.select("p") if p.get_text(strip=True)]
-        if parts:
-            txt = " ".join(parts).replace("  ", " ").strip().replace(" ,", ",")
-            return txt
-
-    text = card.get_text(" ", strip=True)
-    m = re.search(r"\d+(?:[.,]\d{1,2})?\s*€", text)
-    return m.group(0) if m else None
-
-
 # =========================
 # MAGASINS
 # =========================
@@ -175,10 +195,11 @@ def extract_price_from_full_card(card):
 def get_all_carrefour_stores(driver):
     print("[INFO] Récupération des magasins Carrefour...")
     driver.get(f"{BASE_URL}/magasin?sq=magasin&noRedirect")
-    time.sleep(6)
+    wait_network_idle(driver, timeout=PAGE_IDLE_TIMEOUT)
 
     driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(4)
+    wait_network_idle(driver, timeout=PAGE_IDLE_TIMEOUT)
+    wait_dom_settled(driver, timeout=DOM_SETTLE_TIMEOUT)
 
     soup = BeautifulSoup(driver.page_source, "html.parser")
     stores = []
@@ -199,8 +220,10 @@ def get_all_carrefour_stores(driver):
 
 def set_store(driver, store):
     print(f"[MAGASIN] Activation : {store['nom']}")
-    driver.get(store["url"])
-    time.sleep(random.uniform(3, 5))
+    with host_slot(store["url"]):
+        driver.get(store["url"])
+        # le magasin est mémorisé par les appels XHR/cookies de la page : on attend qu'ils soient finis
+        wait_network_idle(driver, timeout=PAGE_IDLE_TIMEOUT)
 
 
 # =========================
@@ -208,7 +231,7 @@ def set_store(driver, store):
 # =========================
 
 def count_visible_products(driver) -> int:
-    return len(driver.find_elements(By.CSS_SELECTOR, "a.product-card-click-wrapper[href]"))
+    return count_elements(driver, PRODUCT_SELECTOR)
 
 
 def scroll_to_stabilize(driver):
@@ -219,12 +242,16 @@ def scroll_to_stabilize(driver):
         print(f"    [SCROLL] départ: {last} produits visibles")
 
     for i in range(SCROLL_MAX_ROUNDS):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(SCROLL_PAUSE + random.uniform(0.2, 0.6))
-        cur = count_visible_products(driver)
+        with host_slot(BASE_URL):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            # rend la main dès que les nouvelles cartes sont rendues, sinon après le timeout appris ;
+            # dernier tour avant d'arrêter : confirmé jusqu'au plafond
+            cur, latency = wait_for_count_change(driver, PRODUCT_SELECTOR, last, adaptive=scroll_timeout(),
+                                                 confirm=stable == SCROLL_STABLE_ROUNDS - 1)
 
         if DEBUG:
-            print(f"    [SCROLL] tour {i+1}: {cur} produits visibles")
+            attente = f"{latency:.2f}s" if latency is not None else "timeout"
+            print(f"    [SCROLL] tour {i+1}: {cur} produits visibles ({attente})")
 
         if cur <= last:
             stable += 1
@@ -232,7 +259,7 @@ def scroll_to_stabilize(driver):
             stable = 0
         last = cur
 
-        if stable >= 3:
+        if stable >= SCROLL_STABLE_ROUNDS:
             break
 
 
@@ -240,44 +267,77 @@ def scroll_to_stabilize(driver):
 # EXTRACTION PRODUITS
 # =========================
 
-def extract_products_from_current_page(page_source, store, category_name):
-    soup = BeautifulSoup(page_source, "html.parser")
+def build_row(nom, href, prix_txt, store, category_name):
+    nom = nom or "N/A"
+    url_produit = (BASE_URL + href) if href.startswith("/") else href
+    prix_txt = prix_txt or "N/A"
 
-    raw_cards = soup.select("div.product-list-card-plp-grid-new, div[class*='product-list-card'], article")
-    product_cards = []
-    for c in raw_cards:
-        if c.select_one("a.product-card-click-wrapper[href]") and c.select_one("h3.product-card-title__text"):
-            product_cards.append(c)
+    return {
+        "produit": nom,
+        "marque": guess_marque_from_name(nom),
+        "code_barre": extract_code_barre_from_url(url_produit),
+        "prix": prix_txt,
+        "prix_num": parse_price_to_float(prix_txt),
+        "categorie": category_name,
+        "magasin": store["nom"],
+        "url_magasin": store["url"],
+        "url_produit": url_produit
+    }
 
-    rows = []
-    for card in product_cards:
-        nom_el = card.select_one("h3.product-card-title__text")
-        nom = nom_el.get_text(strip=True) if nom_el else "N/A"
 
-        marque = guess_marque_from_name(nom)
-
-        a = card.select_one("a.product-card-click-wrapper[href]")
-        href = a["href"] if a else ""
-        url_produit = (BASE_URL + href) if href.startswith("/") else href
-
-        code_barre = extract_code_barre_from_url(url_produit)
+# =========================
+# EXTRACTION INCRÉMENTALE (JS)
+# =========================
 
-        prix_txt = extract_price_from_full_card(card) or "N/A"
-        prix_num = parse_price_to_float(prix_txt)
+# -> [[nom, href, prix_txt], ...] pour les cartes pas encore lues
+# data-sae-vu mémorise le href lu : une carte recyclée par le site (autre href) est relue.
+# carte sans prix (prix pas encore rendu) : ni renvoyée ni marquée, relue au passage suivant ;
+# passage final (arguments[1]) : renvoyée quand même, prix "N/A".
+# textOf = get_text(sep, strip=True) de BeautifulSoup : nœuds texte nettoyés, joints par sep.
+HARVEST_JS = """
+var prune = arguments[0], final = arguments[1], out = [];
+function clean(s) { return (s || '').replace(/\u00a0/g, ' ').trim(); }
+function textOf(node, sep) {
+  var parts = [], w = document.createTreeWalker(node, NodeFilter.SHOW_TEXT), n;
+  while ((n = w.nextNode())) { var t = clean(n.nodeValue); if (t) parts.push(t); }
+  return parts.join(sep);
+}
+function priceText(card) {
+  var sels = ['[data-testid="product-price__amount--main"]', '[data-testid^="product-price__amount"]'];
+  for (var i = 0; i < sels.length; i++) {
+    var el = card.querySelector(sels[i]);
+    if (!el) continue;
+    var parts = [];
+    el.querySelectorAll('p').forEach(function (p) { var t = textOf(p, ''); if (t) parts.push(t); });
+    if (parts.length) return parts.join(' ').replace(/  /g, ' ').trim().replace(/ ,/g, ',');
+  }
+  var m = textOf(card, ' ').match(/\d+(?:[.,]\d{1,2})?\s*€/);
+  return m ? m[0] : null;
+}
+document.querySelectorAll('a.product-card-click-wrapper[href]').forEach(function (a) {
+  var href = a.getAttribute('href');
+  if (a.getAttribute('data-sae-vu') === href) return;
+  var card = a.closest("div.product-list-card-plp-grid-new, div[class*='product-list-card'], article");
+  var title = card && card.querySelector('h3.product-card-title__text');
+  if (!title) return;                       // carte pas encore rendue : relue au prochain passage
+  var prix = priceText(card);
+  if (prix === null && !final) return;      // prix pas encore rendu : idem
+  out.push([textOf(title, ''), href, prix]);
+  a.setAttribute('data-sae-vu', href);
+  if (prune) card.remove();
+});
+window.__saeVus = (window.__saeVus || 0) + out.length;   // lu par waits.probe_progress
+return out;
+"""
 
-        rows.append({
-            "produit": nom,
-            "marque": marque,
-            "code_barre": code_barre,
-            "prix": prix_txt,
-            "prix_num": prix_num,
-            "categorie": category_name,
-            "magasin": store["nom"],
-            "url_magasin": store["url"],
-            "url_produit": url_produit
-        })
 
-    return rows
+def harvest_new_cards(driver, store, category_name, best, prune=PRUNE_CAPTURED_CARDS, final=False) -> int:
+    # lit les nouvelles cartes et les fusionne dans best (dédup au fil de l'eau) -> nb de cartes lues
+    # final=True : dernier passage, les cartes toujours sans prix sont gardées (prix "N/A")
+    cards = driver.execute_script(HARVEST_JS, prune, final) or []
+    for nom, href, prix_txt in cards:
+        merge_row(best, build_row(nom, href or "", prix_txt, store, category_name))
+    return len(cards)
 
 
 # =========================
@@ -294,13 +354,29 @@ def click_load_more_products(driver) -> bool:
         (By.XPATH, "//button[contains(., 'produits suivants')]"),
     ]
 
+    # un seul WebDriverWait pour tous les sélecteurs (au lieu de 6 s par sélecteur absent)
+    def find_button(d):
+        for by, sel in selectors:
+            found = d.find_elements(by, sel)
+            if found:
+                return found[0]
+        return False
+
+    # timeout appris d'abord, puis confirmation jusqu'au plafond avant de conclure "plus de bouton"
+    # (le timeout appris n'a vu que des succès : un re-rendu lent du bouton finirait la catégorie trop tôt)
     btn = None
-    for by, sel in selectors:
+    adaptive = button_timeout()
+    t0 = time.monotonic()
+    for timeout in (adaptive.current(), adaptive.ceiling):
+        remaining = timeout - (time.monotonic() - t0)
+        if remaining <= 0:
+            continue
         try:
-            btn = WebDriverWait(driver, 6).until(EC.presence_of_element_located((by, sel)))
+            btn = WebDriverWait(driver, remaining, poll_frequency=0.2).until(find_button)
+            adaptive.observe(time.monotonic() - t0)
             break
         except Exception:
-            continue
+            pass
 
     if not btn:
         return False
@@ -313,13 +389,13 @@ def click_load_more_products(driver) -> bool:
     except Exception:
         pass
 
-    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-    time.sleep(0.5)
-    driver.execute_script("arguments[0].click();", btn)
-
     try:
-        WebDriverWait(driver, 25).until(lambda d: count_visible_products(d) > old_count)
-        return True
+        with host_slot(BASE_URL):
+            # clic JS : pas besoin d'attendre la fin du scrollIntoView
+            driver.execute_script("arguments[0].scrollIntoView({block:'center'}); arguments[0].click();", btn)
+            cur, _ = wait_for_count_change(driver, PRODUCT_SELECTOR, old_count, adaptive=load_more_timeout(),
+                                           confirm=True)
+        return cur > old_count
     except Exception:
         return False
 
@@ -328,17 +404,14 @@ def click_load_more_products(driver) -> bool:
 # DEDUP
 # =========================
 
-def deduplicate_rows(rows):
-    best = {}
-    for r in rows:
-        key = (r.get("url_magasin"), r.get("url_produit"))
-        if key not in best:
-            best[key] = r
-            continue
-        old = best[key]
-        if old.get("prix_num") is None and r.get("prix_num") is not None:
-            best[key] = r
-    return list(best.values())
+def merge_row(best, r):
+    key = (r.get("url_magasin"), r.get("url_produit"))
+    if key not in best:
+        best[key] = r
+        return
+    old = best[key]
+    if old.get("prix_num") is None and r.get("prix_num") is not None:
+        best[key] = r
 
 
 # =========================
@@ -380,35 +453,165 @@ def write_product_code_file(product: dict):
 
 def scrape_category_for_store(driver, category_url, store, category_name):
     print(f"  ↳ Catégorie : {category_name}")
-    driver.get(category_url)
+    with host_slot(category_url):
+        driver.get(category_url)
 
-    WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, "a.product-card-click-wrapper"))
-    )
-    time.sleep(random.uniform(1.0, 2.0))
+        WebDriverWait(driver, 30).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "a.product-card-click-wrapper"))
+        )
+    wait_dom_settled(driver, timeout=DOM_SETTLE_TIMEOUT)
 
-    scroll_to_stabilize(driver)
+    best = {}
+    before = 0
+    try:
+        scroll_to_stabilize(driver)
+        before += harvest_new_cards(driver, store, category_name, best)
 
-    for i in range(MAX_LOAD_MORE_CLICKS):
-        if DEBUG:
-            print(f"    [LOAD_MORE] clic {i+1}/{MAX_LOAD_MORE_CLICKS} | visibles={count_visible_products(driver)}")
-        ok = click_load_more_products(driver)
-        if not ok:
+        for i in range(MAX_LOAD_MORE_CLICKS):
             if DEBUG:
-                print("    [LOAD_MORE] plus de bouton ou pas de nouveaux produits -> stop.")
-            break
-        scroll_to_stabilize(driver)
-        time.sleep(random.uniform(0.6, 1.2))
+                p = probe_progress(driver, PRODUCT_SELECTOR)
+                print(f"    [LOAD_MORE] clic {i+1}/{MAX_LOAD_MORE_CLICKS} | visibles={p.count} | lus={p.captured} "
+                      f"| uniques={len(best)} | hauteur={p.height}px")
+            ok = click_load_more_products(driver)
+            if not ok:
+                if DEBUG:
+                    print("    [LOAD_MORE] plus de bouton ou pas de nouveaux produits -> stop.")
+                break
+            scroll_to_stabilize(driver)
+            before += harvest_new_cards(driver, store, category_name, best)
+
+        before += harvest_new_cards(driver, store, category_name, best, final=True)
 
-    rows = extract_products_from_current_page(driver.page_source, store, category_name)
+    except Exception as e:
+        # les cartes déjà lues sont conservées
+        print(f"    [ERREUR] {category_name} interrompue après {len(best)} produits : {e}")
+        if not best:
+            raise
 
-    before = len(rows)
-    rows = deduplicate_rows(rows)
-    after = len(rows)
-    print(f"    → {after} produits après dédup (avant {before})")
+    rows = list(best.values())
+    print(f"    → {len(rows)} produits après dédup (avant {before})")
     return rows
 
 
+# =========================
+# MODE PARALLÈLE (POOL DE DRIVERS)
+# =========================
+
+def build_jobs(stores):
+    # ordre magasin -> catégories : un worker enchaîne souvent des jobs du même magasin (pas de set_store)
+    return [(store, cat_name, cat_url) for store in stores for cat_name, cat_url in CATEGORIES.items()]
+
+
+def scrape_worker(worker_id, job_q, result_q, host_slots, host_names, slot_held):
+    # 1 process = 1 Chrome ; le magasin actif reste mémorisé entre deux jobs
+    global _host_slots, _host_index, _slot_held, _worker_id
+    _host_slots = host_slots
+    _host_index = {h: i for i, h in enumerate(host_names)}
+    _slot_held = slot_held
+    _worker_id = worker_id
+
+    driver = configure_selenium()
+    current_store = None
+    try:
+        while True:
+            job = job_q.get()
+            if job is None:
+                break
+            store, cat_name, cat_url = job
+            try:
+                if current_store != store["url"]:
+                    set_store(driver, store)
+                    current_store = store["url"]
+                rows = scrape_category_for_store(driver, cat_url, store, cat_name)
+                result_q.put(("ok", worker_id, store["nom"], cat_name, rows))
+            except Exception as e:
+                print(f"[ERREUR] worker {worker_id} | {store['nom']} / {cat_name} : {e}")
+                result_q.put(("erreur", worker_id, store["nom"], cat_name, []))
+                # driver dans un état inconnu -> on repart d'un Chrome neuf
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                driver = configure_selenium()
+                current_store = None
+    finally:
+        driver.quit()
+
+
+def release_dead_worker_slots(procs, host_slots, host_names, slot_held):
+    # un worker mort (crash Chrome, OOM...) en tenant un créneau ne le rendra jamais : le parent s'en charge
+    for i, p in enumerate(procs):
+        if p.is_alive() or p.exitcode is None:
+            continue
+        with slot_held.get_lock():
+            idx = slot_held[i]
+            slot_held[i] = -1
+        if idx >= 0:
+            print(f"[WARN] worker {i} arrêté (code {p.exitcode}) en tenant un créneau {host_names[idx]} : rendu")
+            host_slots[host_names[idx]].release()
+
+
+def scrape_parallel(stores, workers=PARALLEL_WORKERS):
+    jobs = build_jobs(stores)
+    workers = max(1, min(workers, len(jobs)))
+    print(f"[INFO] Mode parallèle : {len(jobs)} jobs, {workers} workers, {MAX_PER_HOST} max/hôte")
+
+    job_q = mp.Queue()
+    result_q = mp.Queue()
+    host_names = sorted({host_of(BASE_URL)} | {host_of(s["url"]) for s in stores} | {host_of(url) for _, _, url in jobs})
+    host_slots = {h: mp.BoundedSemaphore(MAX_PER_HOST) for h in host_names}
+    slot_held = mp.Array("i", [-1] * workers)   # créneau tenu par chaque worker (indice d'hôte)
+
+    for job in jobs:
+        job_q.put(job)
+    for _ in range(workers):
+        job_q.put(None)
+
+    procs = [mp.Process(target=scrape_worker, args=(i, job_q, result_q, host_slots, host_names, slot_held),
+                        daemon=True)
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    # lecture des résultats AVANT join (sinon les gros messages bloquent la file)
+    all_rows = []
+    remaining = len(jobs)
+    waited = 0
+    while remaining:
+        release_dead_worker_slots(procs, host_slots, host_names, slot_held)
+        try:
+            status, worker_id, store_nom, cat_name, rows = result_q.get(timeout=5)
+        except queue.Empty:
+            waited += 5
+            if not any(p.is_alive() for p in procs) or waited >= WORKER_RESULT_TIMEOUT:
+                print(f"[ERREUR] {remaining} jobs sans résultat (workers arrêtés ou bloqués)")
+                break
+            continue
+        waited = 0
+        remaining -= 1
+        all_rows.extend(rows)
+        print(f"[{status.upper()}] w{worker_id} {store_nom} / {cat_name} : {len(rows)} produits "
+              f"({len(jobs) - remaining}/{len(jobs)})")
+
+    for p in procs:
+        p.join(timeout=30)
+        if p.is_alive():
+            p.terminate()
+    return all_rows
+
+
+def scrape_sequential(driver, stores):
+    all_rows = []
+    for store in stores:
+        set_store(driver, store)
+
+        for cat_name, cat_url in CATEGORIES.items():
+            all_rows.extend(scrape_category_for_store(driver, cat_url, store, cat_name))
+
+        time.sleep(random.uniform(2, 4))
+    return all_rows
+
+
 # =========================
 # MAIN
 # =========================
@@ -424,16 +627,17 @@ if __name__ == "__main__":
     try:
         stores = get_all_carrefour_stores(driver)[:MAX_STORES]
 
-        for store in stores:
-            set_store(driver, store)
-
-            for cat_name, cat_url in CATEGORIES.items():
-                all_products.extend(scrape_category_for_store(driver, cat_url, store, cat_name))
-
-            time.sleep(random.uniform(2, 4))
+        if PARALLEL_WORKERS > 1:
+            # la liste des magasins suffit : chaque worker ouvre son propre Chrome
+            driver.quit()
+            driver = None
+            all_products = scrape_parallel(stores, PARALLEL_WORKERS)
+        else:
+            all_products = scrape_sequential(driver, stores)
 
     finally:
-        driver.quit()
+        if driver is not None:
+            driver.quit()
 
     columns = ["produit", "marque", "code_barre", "prix", "prix_num",
                "categorie", "magasin", "url_magasin", "url_produit"]
@@ -1,30 +1,12 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-import time
+
+# driver partagé + attentes événementielles (même dossier)
+from browser import make_driver
+from waits import wait_network_idle
 
 def configure_selenium():
-    """Configure Selenium pour simuler un navigateur Chrome."""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    )
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    chrome_options.add_experimental_option("prefs", prefs)
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
-    return driver
+    """Driver Chrome partagé (browser.py) : images, polices et trackers bloqués via CDP."""
+    return make_driver("magasins")
 
 def scrape_magasins_carrefour():
     """Scrape la liste des magasins Carrefour en France."""
@@ -34,7 +16,7 @@ def scrape_magasins_carrefour():
         url = "https://www.carrefour.fr/magasins"
         print(f"[INFO] Accès à la page des magasins : {url}")
         driver.get(url)
-        time.sleep(5)
+        wait_network_idle(driver, timeout=30)
 
         html = driver.page_source
         soup = BeautifulSoup(html, "html.parser")
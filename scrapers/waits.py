@@ -0,0 +1,236 @@
+# waits.py
+# Attentes événementielles pour les scrapers Selenium (remplacent les time.sleep fixes).
+# ✅ "le nombre de produits a changé" : MutationObserver côté page, une seule requête WebDriver (execute_async_script)
+# ✅ "le DOM ne bouge plus" : même observer, résolu après une fenêtre sans mutation
+# ✅ réseau au repos : requêtes en vol suivies via les événements CDP Network.* (log "performance" de ChromeDriver)
+# ✅ timeouts adaptatifs par site : appris sur les latences récentes, bornés [plancher, plafond]
+# ✅ comptage / sonde de progression : un seul execute_script, aucun WebElement matérialisé
+#
+# Le log "performance" doit être activé à la création du driver :
+#   options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+# sans lui, wait_network_idle retombe sur readyState + DOM stable.
+
+import json
+import time
+import weakref
+from collections import deque, namedtuple
+
+SETTLE_MS = 250            # DOM considéré stable après cette fenêtre sans mutation
+SETTLE_MAX_MS = 1000       # nombre de cartes atteint : on n'attend pas plus le calme (carrousel animé)
+NETWORK_IDLE_MS = 500      # réseau considéré au repos après cette fenêtre
+NETWORK_MAX_INFLIGHT = 2   # requêtes tolérées en vol (long polling, trackers)
+NETWORK_STALE_S = 10       # requête jamais terminée au-delà -> ignorée
+POLL_S = 0.1
+
+# resolve({count, firstChangeMs}) :
+# - sel fourni : dès que count > old, puis attente d'une fenêtre sans mutation (cartes rendues),
+#                au plus settleMaxMs après le changement (le reste de la page peut bouger sans fin)
+# - sel null   : dès qu'aucune mutation n'a eu lieu pendant settleMs
+_WAIT_JS = """
+var sel = arguments[0], old = arguments[1], timeoutMs = arguments[2], settleMs = arguments[3];
+var settleMaxMs = arguments[4];
+var done = arguments[arguments.length - 1];
+var t0 = performance.now(), firstChange = null, settle = null, finished = false, obs = null, hard = null, cap = null;
+function count() { return sel ? document.querySelectorAll(sel).length : -1; }
+function finish() {
+  if (finished) return;
+  finished = true;
+  if (obs) obs.disconnect();
+  clearTimeout(hard); clearTimeout(settle); clearTimeout(cap);
+  done({count: count(), firstChangeMs: firstChange});
+}
+function check() {
+  if (sel && count() <= old) return;
+  if (firstChange === null) {
+    firstChange = performance.now() - t0;
+    if (sel) cap = setTimeout(finish, settleMaxMs);
+  }
+  clearTimeout(settle);
+  settle = setTimeout(finish, settleMs);
+}
+obs = new MutationObserver(check);
+obs.observe(document.documentElement, {childList: true, subtree: true});
+hard = setTimeout(finish, timeoutMs);
+if (sel) { check(); } else { settle = setTimeout(finish, settleMs); }
+"""
+
+
+_COUNT_JS = "return document.querySelectorAll(arguments[0]).length;"
+
+# window.__saeVus : compteur de cartes déjà lues, tenu par l'extracteur incrémental (carrefour.HARVEST_JS)
+_PROBE_JS = """
+return [document.querySelectorAll(arguments[0]).length, window.__saeVus || 0,
+        document.body ? document.body.scrollHeight : 0];
+"""
+
+Progress = namedtuple("Progress", ["count", "captured", "height"])
+
+
+# =========================
+# COMPTAGE / PROGRESSION
+# =========================
+
+def count_elements(driver, selector) -> int:
+    # querySelectorAll(...).length côté page : un aller-retour, au lieu d'un WebElement par carte
+    return int(driver.execute_script(_COUNT_JS, selector) or 0)
+
+
+def probe_progress(driver, selector) -> Progress:
+    # cartes présentes + cartes déjà lues (même si retirées du DOM) + hauteur de page, en un appel
+    count, captured, height = driver.execute_script(_PROBE_JS, selector)
+    return Progress(int(count), int(captured), int(height))
+
+
+# =========================
+# TIMEOUTS ADAPTATIFS
+# =========================
+
+class AdaptiveTimeout:
+    # timeout = quantile(latences récentes) * marge, borné ; valeur initiale tant qu'il y a peu d'échantillons
+    def __init__(self, initial, floor, ceiling, margin=2.0, quantile=0.9, window=30, min_samples=5):
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self.margin = margin
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+
+    def current(self) -> float:
+        if len(self._samples) < self.min_samples:
+            return self.initial
+        s = sorted(self._samples)
+        q = s[min(len(s) - 1, int(self.quantile * len(s)))]
+        return max(self.floor, min(self.ceiling, q * self.margin))
+
+
+_timeouts = {}
+
+
+def site_timeout(site, kind, initial, floor, ceiling, **kw) -> AdaptiveTimeout:
+    # un jeu de timeouts par (site, type d'attente), propre à chaque process
+    key = (site, kind)
+    t = _timeouts.get(key)
+    if t is None:
+        t = _timeouts[key] = AdaptiveTimeout(initial, floor, ceiling, **kw)
+    return t
+
+
+# =========================
+# ÉTAT PAR DRIVER
+# =========================
+
+class _DriverState:
+    def __init__(self):
+        self.script_timeout = None
+        self.inflight = {}            # requestId -> instant de départ (time.monotonic)
+        self.perf_log = True          # False si le log "performance" n'est pas activé
+
+
+_states = weakref.WeakKeyDictionary()
+
+
+def _state(driver) -> _DriverState:
+    st = _states.get(driver)
+    if st is None:
+        st = _states[driver] = _DriverState()
+    return st
+
+
+def _run_wait(driver, sel, old, timeout, settle_ms):
+    st = _state(driver)
+    needed = timeout + 5
+    if st.script_timeout is None or st.script_timeout < needed:
+        driver.set_script_timeout(needed)
+        st.script_timeout = needed
+    res = driver.execute_async_script(_WAIT_JS, sel, old, int(timeout * 1000), settle_ms, SETTLE_MAX_MS) or {}
+    first = res.get("firstChangeMs")
+    return res.get("count", -1), (None if first is None else first / 1000.0)
+
+
+# =========================
+# ATTENTES DOM
+# =========================
+
+def wait_for_count_change(driver, selector, old_count, timeout=None, settle_ms=SETTLE_MS, adaptive=None,
+                          confirm=False):
+    # -> (nouveau nombre, latence du premier changement en s ou None si timeout)
+    # timeout None -> timeout appris (adaptive) ; confirm=True : rien après le timeout appris ->
+    # on attend jusqu'au plafond avant de conclure (le timeout appris n'a vu que des succès, il est optimiste)
+    if timeout is None:
+        timeout = adaptive.current()
+    count, latency = _run_wait(driver, selector, old_count, timeout, settle_ms)
+    if latency is None and confirm and adaptive is not None and adaptive.ceiling > timeout:
+        count, latency = _run_wait(driver, selector, old_count, adaptive.ceiling - timeout, settle_ms)
+        if latency is not None:
+            latency += timeout   # latence réelle, apprise telle quelle -> le timeout remonte
+    if adaptive is not None and latency is not None:
+        adaptive.observe(latency)
+    return count, latency
+
+
+def wait_dom_settled(driver, timeout=10, settle_ms=SETTLE_MS) -> bool:
+    # True si le DOM est resté calme settle_ms avant le timeout
+    t0 = time.monotonic()
+    _run_wait(driver, None, 0, timeout, settle_ms)
+    return time.monotonic() - t0 < timeout
+
+
+# =========================
+# RÉSEAU (CDP)
+# =========================
+
+def _drain_network_events(driver, st):
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        st.perf_log = False
+        return
+    now = time.monotonic()
+    for entry in entries:
+        try:
+            msg = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        method = msg.get("method", "")
+        if method == "Network.requestWillBeSent":
+            st.inflight[msg["params"]["requestId"]] = now
+        elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+            st.inflight.pop(msg["params"]["requestId"], None)
+
+
+def wait_network_idle(driver, timeout=30, idle_ms=NETWORK_IDLE_MS, max_inflight=NETWORK_MAX_INFLIGHT) -> bool:
+    # True dès que <= max_inflight requêtes sont en vol pendant idle_ms
+    st = _state(driver)
+    deadline = time.monotonic() + timeout
+    idle_since = None
+
+    while st.perf_log:
+        _drain_network_events(driver, st)
+        now = time.monotonic()
+        for rid, started in list(st.inflight.items()):
+            if now - started > NETWORK_STALE_S:
+                del st.inflight[rid]
+
+        if len(st.inflight) <= max_inflight:
+            if idle_since is None:
+                idle_since = now
+            if (now - idle_since) * 1000 >= idle_ms:
+                return True
+        else:
+            idle_since = None
+
+        if now >= deadline:
+            return False
+        time.sleep(POLL_S)
+
+    # pas de log CDP : document chargé + DOM stable
+    try:
+        while time.monotonic() < deadline and driver.execute_script("return document.readyState") != "complete":
+            time.sleep(POLL_S)
+    except Exception:
+        pass
+    return wait_dom_settled(driver, timeout=max(0.5, deadline - time.monotonic()), settle_ms=idle_ms)
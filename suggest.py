@@ -0,0 +1,122 @@
+# suggest.py
+# Autocomplétion (/api/suggest) servie depuis la mémoire, sans requête SQL par frappe.
+# ✅ noms de produits et marques normalisés (minuscules, sans accents, œ -> oe)
+# ✅ "pat" trouve "Pâtes Barilla" et "Barilla Pâtes" : chaque début de mot est une clé
+# ✅ liste triée + bisect ; top N précalculé pour les préfixes courts (ceux qui ont le plus de candidats)
+# ✅ reconstruit quand la version des données change (import terminé), en arrière-plan
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+PRECOMPUTE_LEN = 3   # préfixes de 1 à 3 caractères : réponse toute prête
+TOP_N = 10
+
+
+def normalize(txt: str) -> str:
+    txt = (txt or "").lower().replace("œ", "oe").replace("æ", "ae")
+    txt = unicodedata.normalize("NFKD", txt)
+    txt = "".join(ch for ch in txt if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", txt).strip()
+
+
+class SuggestIndex:
+    def __init__(self, entries, top_n=TOP_N):
+        # entries : [(texte affiché, type, score)] ; score plus grand = proposé en premier
+        self.entries = entries
+        self.top_n = top_n
+
+        pairs = []
+        for e, (texte, _, _) in enumerate(entries):
+            words = normalize(texte).split()
+            for i in range(len(words)):
+                pairs.append((" ".join(words[i:]), e))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.refs = [e for _, e in pairs]
+
+        # préfixes courts : trop de candidats pour un parcours à chaque frappe
+        buckets = {}
+        for key, e in pairs:
+            for n in range(1, min(PRECOMPUTE_LEN, len(key)) + 1):
+                buckets.setdefault(key[:n], set()).add(e)
+        self.top = {p: self._best(ids, top_n) for p, ids in buckets.items()}
+
+    def _best(self, ids, n):
+        return heapq.nsmallest(n, ids, key=lambda e: (-self.entries[e][2], self.entries[e][0]))
+
+    def search(self, q, n=None):
+        n = n or self.top_n
+        q = normalize(q)
+        if not q:
+            return []
+        if len(q) <= PRECOMPUTE_LEN and n <= self.top_n:
+            ids = self.top.get(q, [])[:n]
+        else:
+            lo = bisect.bisect_left(self.keys, q)
+            hi = bisect.bisect_left(self.keys, q + "\uffff")
+            ids = self._best(set(self.refs[lo:hi]), n)
+        return [self.entries[e] for e in ids]
+
+
+def load_entries(cur):
+    # score = nb de magasins où le produit a un prix (les noms en double sont fusionnés)
+    cur.execute("""
+        SELECT p.nom_produit, mq.nom_marque AS marque, COUNT(pc.id_magasin) AS nb
+        FROM produit p
+        LEFT JOIN marque mq ON mq.id_marque = p.id_marque
+        LEFT JOIN prix_courant pc ON pc.id_produit = p.id_produit
+        GROUP BY p.id_produit, mq.id_marque;
+    """)
+    produits, marques = {}, {}
+    for r in cur:
+        nom, marque, nb = (r["nom_produit"], r["marque"], r["nb"]) if isinstance(r, dict) else r
+        key = normalize(nom)
+        texte, score = produits.get(key, (nom, 0))
+        produits[key] = (texte, score + nb)
+        if marque:
+            key = normalize(marque)
+            texte, score = marques.get(key, (marque, 0))
+            marques[key] = (texte, score + nb)
+
+    entries = [(t, "produit", s) for t, s in produits.values()]
+    entries += [(t, "marque", s) for t, s in marques.values()]
+    return entries
+
+
+class Suggester:
+    # index courant + sa version des données ; remplacé d'un bloc (lecture sans verrou)
+    def __init__(self, get_conn, top_n=TOP_N):
+        self.get_conn = get_conn
+        self.top_n = top_n
+        self._current = None     # (version, SuggestIndex)
+        self._building = threading.Lock()
+
+    def _build(self, version):
+        with self.get_conn() as conn, conn.cursor() as cur:
+            entries = load_entries(cur)
+        self._current = (version, SuggestIndex(entries, self.top_n))
+
+    def _rebuild_async(self, version):
+        def run():
+            try:
+                self._build(version)
+            finally:
+                self._building.release()
+        if self._building.acquire(blocking=False):
+            threading.Thread(target=run, name="suggest-rebuild", daemon=True).start()
+
+    def index(self, version):
+        current = self._current
+        if current is None:
+            # premier appel : construction synchrone (une seule fois)
+            with self._building:
+                if self._current is None:
+                    self._build(version)
+            return self._current[1]
+        if current[0] != version:
+            # nouvel import : on continue de servir l'ancien index pendant la reconstruction
+            self._rebuild_async(version)
+        return current[1]
@@ -0,0 +1,33 @@
+import base64
+import json
+from decimal import Decimal
+
+from database.pagination import NUMBER, TEXT, decode_cursor, encode_cursor
+
+
+def forge(payload):
+    raw = json.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("pertinence", [0.5, Decimal("1.99")], 42)
+    assert decode_cursor(token, "pertinence", [NUMBER, NUMBER]) == ([0.5, Decimal("1.99")], 42)
+    assert decode_cursor(encode_cursor("nom_asc", ["riz"], 7), "nom_asc", [TEXT]) == (["riz"], 7)
+
+
+def test_tampered_cursor_falls_back_to_first_page():
+    # jeton modifié à la main : None (page 1) plutôt qu'une erreur SQL
+    for values, id_value in [
+        ([["1"]], 1),            # liste
+        ([{"x": "1"}], 1),       # objet sans "d"
+        ([{"d": "abc"}], 1),     # Decimal invalide
+        (["1.99"], 1),           # texte à la place d'un prix
+        ([True], 1),
+        ([1.5], "1"),            # id non entier
+        ([1.5], 2**70),
+    ]:
+        token = forge({"s": "prix_asc", "v": values, "id": id_value})
+        assert decode_cursor(token, "prix_asc", [NUMBER]) is None
+    assert decode_cursor(forge({"s": "nom_asc", "v": [3], "id": 1}), "nom_asc", [TEXT]) is None
+    assert decode_cursor(forge({"s": "prix_asc", "v": "1", "id": 1}), "prix_asc", [NUMBER]) is None
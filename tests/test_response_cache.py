@@ -0,0 +1,12 @@
+from response_cache import make_key
+
+
+def test_make_key_ignores_order_and_empty_values():
+    assert make_key({"sort": "prix_asc", "nom": "riz", "marque": ""}) == make_key({"nom": "riz", "sort": "prix_asc"})
+
+
+def test_make_key_escapes_separators_in_values():
+    # un curseur forgé ne doit pas retomber sur la clé d'une autre page
+    forged = make_key({"apres": "c&cat_id=5", "sort": "prix_asc"})
+    real = make_key({"apres": "c", "cat_id": "5", "sort": "prix_asc"})
+    assert forged != real